@@ -0,0 +1,102 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+# Aktionen, die auf den gesamten Server-Zustand schauen. Sie warten auf alle
+# vorherigen Aktionen und alle folgenden Aktionen warten auf sie.
+BARRIER_ACTIONS = {"analyze_channels", "analyze_roles"}
+
+# Aktionen ohne Seiteneffekte und ohne Abhängigkeiten
+INDEPENDENT_ACTIONS = {"error", "list_users", "get_user_info", "search_messages"}
+
+# Zielkanal von troll_channel und channel_sequence, wenn keiner angegeben ist
+DEFAULT_CHANNEL = "allgemein"
+
+def _name(value) -> str:
+    return str(value or "").lower()
+
+def get_resource_keys(action_data: Dict) -> Optional[Set[Tuple[str, str]]]:
+    """Ressourcen, die eine Aktion liest oder verändert.
+
+    Zwei Aktionen mit einer gemeinsamen Ressource laufen in der ursprünglichen
+    Reihenfolge. None bedeutet, dass die Aktion eine Barriere ist.
+    """
+    action = action_data.get("action")
+    params = action_data.get("params") or {}
+
+    if action in BARRIER_ACTIONS:
+        return None
+    if action in INDEPENDENT_ACTIONS:
+        return set()
+    if action == "create_category":
+        return {("category", _name(params.get("name")))}
+    if action == "create_channel":
+        keys = {("channel", _name(params.get("name")))}
+        if params.get("category"):
+            keys.add(("category", _name(params.get("category"))))
+        return keys
+    if action == "move_channel":
+        return {
+            ("channel", _name(params.get("channel"))),
+            ("category", _name(params.get("category")))
+        }
+    if action == "delete_channel":
+        return {("channel", _name(params.get("name")))}
+    if action in ("troll_channel", "channel_sequence"):
+        # Gleicher Standardkanal wie in handle_action, sonst fehlt die Reihenfolge zu #allgemein
+        return {("channel", _name(params.get("channel", DEFAULT_CHANNEL)))}
+    if action in ("update_description", "send_message"):
+        # Nachrichten in denselben Kanal behalten ihre Reihenfolge
+        return {("channel", _name(params.get("channel")))}
+    if action == "create_role":
+        return {("role", _name(params.get("name")))}
+    if action in ("create_command", "delete_command", "list_commands"):
+        # Alle Commands teilen sich eine Datei und einen Command-Tree
+        return {("commands", "")}
+    # Unbekannte Aktionen sind vorsichtshalber ebenfalls Barrieren
+    return None
+
+class ActionExecutor:
+    """Führt Aktionen nebenläufig aus, soweit sie nicht voneinander abhängen"""
+
+    def __init__(self, run_action: Callable[[int, Dict], Awaitable[Any]], max_concurrency: int = 4):
+        self._run_action = run_action
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: List[asyncio.Task] = []
+        self._last_use: Dict[Tuple[str, str], int] = {}
+        self._barrier: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def submit(self, action_data: Dict):
+        """Plant eine Aktion ein; sie startet, sobald ihre Vorgänger fertig sind"""
+        index = len(self._tasks)
+        keys = get_resource_keys(action_data)
+
+        if keys is None:
+            dependencies = set(range(index))
+            self._barrier = index
+        else:
+            dependencies = {self._last_use[key] for key in keys if key in self._last_use}
+            if self._barrier is not None:
+                dependencies.add(self._barrier)
+            for key in keys:
+                self._last_use[key] = index
+
+        waits_for = [self._tasks[i] for i in sorted(dependencies)]
+        self._tasks.append(asyncio.create_task(self._execute(index, action_data, waits_for)))
+
+    async def _execute(self, index: int, action_data: Dict, waits_for: List[asyncio.Task]):
+        if waits_for:
+            # Auch nach einem Fehler des Vorgängers wird weitergemacht, wie bisher
+            await asyncio.wait(waits_for)
+        async with self._semaphore:
+            return await self._run_action(index, action_data)
+
+    async def gather(self) -> List[Any]:
+        """Wartet auf alle Aktionen; Ergebnisse bzw. Exceptions in Einreichungsreihenfolge"""
+        return await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def cancel(self):
+        for task in self._tasks:
+            task.cancel()
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Dict, List, Optional
+
+class ActionStreamParser:
+    """Zerlegt eine KI-Antwort stückweise in einzelne ACTIONS-Objekte"""
+    MARKER = "ACTIONS:"
+
+    def __init__(self):
+        self.buffer = ""
+        self.actions: List[Dict] = []
+        self._pos = 0  # Bis hierhin wurde der Puffer bereits gelesen
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Hängt Text an und gibt alle Aktionen zurück, die dadurch vollständig wurden"""
+        self.buffer += chunk
+        actions = []
+
+        if not self._started:
+            # Der Marker kann über zwei Chunks verteilt ankommen
+            start = max(0, self._pos - len(self.MARKER))
+            index = self.buffer.find(self.MARKER, start)
+            if index == -1:
+                self._pos = len(self.buffer)
+                return actions
+            self._started = True
+            self._pos = index + len(self.MARKER)
+
+        if self._finished:
+            return actions
+
+        buffer = self.buffer
+        i = self._pos
+        while i < len(buffer):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                if self._depth == 0:
+                    self._object_start = i
+                self._depth += 1
+            elif char == '}' and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    actions.append(self._decode(buffer[self._object_start:i + 1]))
+            elif char == ']' and self._depth == 0:
+                # Ende der Aktionsliste, der Rest der Antwort interessiert nicht
+                self._finished = True
+                i += 1
+                break
+            i += 1
+        self._pos = i
+
+        self.actions.extend(actions)
+        return actions
+
+    @property
+    def emitted(self) -> int:
+        return len(self.actions)
+
+    def _decode(self, raw: str) -> Dict:
+        try:
+            action = json.loads(raw)
+            if not isinstance(action, dict) or "action" not in action:
+                raise ValueError("Aktion ohne 'action'-Feld")
+            return action
+        except ValueError as e:
+            logging.error(f"Fehler beim Parsen einer gestreamten Aktion: {str(e)}\nAktion war: {raw}")
+            return {"action": "error", "params": {
+                "error": f"Konnte Antwort nicht verarbeiten: {str(e)}",
+                "original_response": raw
+            }}
+
+class ActionStream:
+    """Liefert Aktionen aus einem Token-Stream, während die KI noch weiter generiert"""
+    _DONE = object()
+
+    def __init__(self, chunks: AsyncIterator[str]):
+        self.parser = ActionStreamParser()
+        self._chunks = chunks
+
+    @property
+    def text(self) -> str:
+        """Bisher empfangene Antwort der KI"""
+        return self.parser.buffer
+
+    @property
+    def actions(self) -> List[Dict]:
+        """Alle bisher erkannten Aktionen"""
+        return self.parser.actions
+
+    @property
+    def emitted(self) -> int:
+        """Anzahl der bisher erkannten Aktionen"""
+        return self.parser.emitted
+
+    async def __aiter__(self):
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def produce():
+            try:
+                async for chunk in self._chunks:
+                    for action in self.parser.feed(chunk):
+                        queue.put_nowait(action)
+            except Exception as e:
+                queue.put_nowait(e)
+            finally:
+                queue.put_nowait(self._DONE)
+
+        # Der Stream wird im Hintergrund weitergelesen, während der Aufrufer
+        # die bereits fertigen Aktionen ausführt
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await queue.get()
+                if item is self._DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            if not producer.done():
+                producer.cancel()
@@ -1,64 +1,213 @@
-import json
 import os
+import time
+from collections import deque
 from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, List, Optional, Tuple
+from config import Config
+from journal_writer import get_journal_writer, load_journal
+
+class InteractionStats:
+    """Laufende Zähler für die Erfolgsquoten, damit nie die ganze Historie durchsucht wird"""
+
+    def __init__(self, time_window: float = 3600):
+        self.time_window = time_window
+        # Fenster der gespeicherten Historie (letzte 100)
+        self.window_total = 0
+        self.window_successful = 0
+        self.window_actions: Dict[str, List[int]] = {}  # Aktion -> [erfolgreich, gesamt]
+        # Zeitfenster (letzte Stunde)
+        self.recent: deque = deque()  # (Zeitpunkt, Erfolg)
+        self.recent_successful = 0
+        # Seit Beginn
+        self.total = 0
+        self.total_successful = 0
+
+    def enter_window(self, interaction: dict):
+        self.window_total += 1
+        self.window_successful += interaction['success']
+        for action, success in interaction.get('actions') or []:
+            counts = self.window_actions.setdefault(action, [0, 0])
+            counts[0] += success
+            counts[1] += 1
+
+    def leave_window(self, interaction: dict):
+        self.window_total -= 1
+        self.window_successful -= interaction['success']
+        for action, success in interaction.get('actions') or []:
+            counts = self.window_actions[action]
+            counts[0] -= success
+            counts[1] -= 1
+            if not counts[1]:
+                del self.window_actions[action]
+
+    def record(self, interaction: dict, timestamp: float):
+        """Zählt eine neue Interaktion für die letzte Stunde und die Gesamtstatistik"""
+        self.total += 1
+        self.total_successful += interaction['success']
+        self.track_recent(timestamp, interaction['success'])
+
+    def track_recent(self, timestamp: float, success: bool):
+        self.recent.append((timestamp, success))
+        self.recent_successful += success
+        self._expire(time.time())
+
+    def _expire(self, now: float):
+        while self.recent and self.recent[0][0] < now - self.time_window:
+            _, success = self.recent.popleft()
+            self.recent_successful -= success
+
+    @staticmethod
+    def _rate(successful: int, total: int) -> float:
+        return (successful / total) * 100 if total else 0.0
+
+    def window_rate(self) -> float:
+        return self._rate(self.window_successful, self.window_total)
+
+    def recent_rate(self) -> float:
+        self._expire(time.time())
+        return self._rate(self.recent_successful, len(self.recent))
+
+    def total_rate(self) -> float:
+        return self._rate(self.total_successful, self.total)
+
+    def action_rates(self) -> Dict[str, float]:
+        return {
+            action: self._rate(successful, total)
+            for action, (successful, total) in self.window_actions.items()
+        }
+
+def _parse_timestamp(value: str) -> float:
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
 
 class AIMemory:
-    def __init__(self):
-        self.memory_file = "ai_memory.json"
-        self.chat_history = []
+    HISTORY_SIZE = 100  # Behalte nur die letzten 100 Interaktionen
+
+    def __init__(self, memory_file: str = "ai_memory.json", seed_file: Optional[str] = None):
+        self.memory_file = memory_file
+        self.seed_file = seed_file  # Startstand, solange es noch keinen eigenen Snapshot gibt
+        # Neue Interaktionen landen im Journal, ai_memory.json ist der letzte Snapshot
+        self.journal_file = os.path.splitext(memory_file)[0] + ".journal.jsonl"
+        self.writer = get_journal_writer()
+        self.chat_history: deque = deque(maxlen=self.HISTORY_SIZE)
+        self.stats = InteractionStats()
         self.score = 0
+        self.seq = 0  # Laufende Nummer des letzten Journal-Eintrags
+        self.journal_entries = 0  # Einträge seit der letzten Kompaktierung
+        self.on_resize: Optional[Callable[[int], None]] = None  # Bekommt das Wachstum der Historie gemeldet
         self.load_memory()
 
     def load_memory(self):
         try:
-            if os.path.exists(self.memory_file):
-                with open(self.memory_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.chat_history = data.get('chat_history', [])
-                    self.score = data.get('score', 0)
+            seeded = (self.seed_file is not None and os.path.exists(self.seed_file)
+                      and not os.path.exists(self.memory_file) and not os.path.exists(self.journal_file))
+            snapshot, records = load_journal(self.seed_file if seeded else self.memory_file, self.journal_file)
+            self.score = snapshot.get('score', 0)
+            self.seq = snapshot.get('last_seq', 0)
+            
+            self.chat_history.clear()
+            self.stats = InteractionStats()
+            for interaction in snapshot.get('chat_history', [])[-self.HISTORY_SIZE:]:
+                self.chat_history.append(interaction)
+                self.stats.enter_window(interaction)
+                self.stats.track_recent(_parse_timestamp(interaction.get('timestamp')), interaction['success'])
+            
+            # Ältere Snapshots kennen nur die gespeicherte Historie
+            totals = snapshot.get('stats', {})
+            self.stats.total = totals.get('total', self.stats.window_total)
+            self.stats.total_successful = totals.get('successful', self.stats.window_successful)
+
+            # Nur die Einträge seit dem letzten Snapshot nachspielen
+            for record in records:
+                interaction = record['interaction']
+                self._apply(interaction, _parse_timestamp(interaction.get('timestamp')))
+                self.seq = record['seq']
+            self.journal_entries = len(records)
+            
+            # Nachgespieltes Journal oder übernommenen Startstand gleich als eigenen Snapshot schreiben
+            if seeded or (os.path.exists(self.journal_file) and os.path.getsize(self.journal_file) > 0):
+                self.save_memory()
         except Exception as e:
             print(f"Fehler beim Laden des AI-Gedächtnisses: {str(e)}")
 
     def save_memory(self):
+        """Schreibt einen Snapshot und leert das Journal (im Hintergrund)"""
         try:
-            with open(self.memory_file, 'w', encoding='utf-8') as f:
-                json.dump({
-                    'chat_history': self.chat_history,
-                    'score': self.score
-                }, f, indent=4, ensure_ascii=False)
+            self.writer.compact(self.journal_file, self.memory_file, self.snapshot())
+            self.journal_entries = 0
         except Exception as e:
             print(f"Fehler beim Speichern des AI-Gedächtnisses: {str(e)}")
 
-    def add_interaction(self, user_input: str, ai_response: str, success: bool, error_message: str = None):
+    def snapshot(self) -> dict:
+        return {
+            'chat_history': list(self.chat_history),
+            'score': self.score,
+            'last_seq': self.seq,
+            'stats': {
+                'total': self.stats.total,
+                'successful': self.stats.total_successful
+            }
+        }
+
+    def add_interaction(self, user_input: str, ai_response: str, success: bool, error_message: str = None,
+                        actions: Optional[List[Tuple[str, bool]]] = None):
         interaction = {
             'timestamp': datetime.now().isoformat(),
             'user_input': user_input,
             'ai_response': ai_response,
             'success': success,
             'error': error_message,
-            'score_change': 10 if success else -5
+            'score_change': 10 if success else -5,
+            'actions': [list(outcome) for outcome in actions or []]  # [Aktion, Erfolg]
         }
         
+        self._apply(interaction, time.time())
+        
+        # Nur anhängen statt die ganze Datei neu zu schreiben
+        self.seq += 1
+        self.writer.append(self.journal_file, {'seq': self.seq, 'interaction': interaction})
+        self.journal_entries += 1
+        if self.journal_entries >= Config.MEMORY_COMPACT_EVERY:
+            self.save_memory()
+
+    def _apply(self, interaction: dict, timestamp: float):
+        # Die deque verwirft die älteste Interaktion selbst, die Zähler müssen mit
+        if len(self.chat_history) == self.chat_history.maxlen:
+            self.stats.leave_window(self.chat_history[0])
+        elif self.on_resize is not None:
+            self.on_resize(1)
         self.chat_history.append(interaction)
+        self.stats.enter_window(interaction)
+        self.stats.record(interaction, timestamp)
         self.score += interaction['score_change']
-        
-        # Behalte nur die letzten 100 Interaktionen
-        if len(self.chat_history) > 100:
-            self.chat_history = self.chat_history[-100:]
-            
-        self.save_memory()
 
     def get_recent_history(self, count: int = 5) -> list:
-        return self.chat_history[-count:]
+        return list(islice(reversed(self.chat_history), count))[::-1]
+
+    def get_history_size(self) -> int:
+        return len(self.chat_history)
 
     def get_score(self) -> int:
         return self.score
 
     def get_success_rate(self) -> float:
-        if not self.chat_history:
-            return 0.0
-        successful = sum(1 for interaction in self.chat_history if interaction['success'])
-        return (successful / len(self.chat_history)) * 100
+        """Erfolgsrate der letzten 100 Interaktionen"""
+        return self.stats.window_rate()
+
+    def get_success_rates(self) -> Dict[str, float]:
+        """Erfolgsraten über verschiedene Zeiträume"""
+        return {
+            'last_100': self.stats.window_rate(),
+            'last_hour': self.stats.recent_rate(),
+            'all_time': self.stats.total_rate()
+        }
+
+    def get_action_success_rates(self) -> Dict[str, float]:
+        """Erfolgsrate je Aktionstyp über die letzten 100 Interaktionen"""
+        return self.stats.action_rates()
 
     def get_context_for_prompt(self, max_items: int = 5) -> str:
         recent = self.get_recent_history(max_items)
@@ -0,0 +1,61 @@
+"""Misst, wie viele Nachrichten pro Sekunde on_message verarbeitet, die den Bot nicht betreffen.
+
+Aufruf: python benchmark_gateway.py [Anzahl Nachrichten]
+
+Läuft in einem temporären Ordner, damit Archiv, Gedächtnis und Log den Bot
+nicht berühren. Discord wird nicht kontaktiert.
+"""
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(tempfile.mkdtemp(prefix="botismus-bench-"))
+
+import main  # noqa: E402
+
+def make_message(number: int, guild, channel, author, content: str):
+    return SimpleNamespace(
+        id=number,
+        content=content,
+        guild=guild,
+        channel=channel,
+        author=author,
+        mentions=[],
+        attachments=[],
+        created_at=datetime.now(timezone.utc)
+    )
+
+async def measure(label: str, messages) -> float:
+    started = time.perf_counter()
+    for message in messages:
+        await main.on_message(message)
+    elapsed = time.perf_counter() - started
+    rate = len(messages) / elapsed
+    print(f"{label:<40} {rate:>12,.0f} Nachrichten/s  ({elapsed * 1e6 / len(messages):.1f} µs pro Nachricht)")
+    return rate
+
+async def run(count: int):
+    general = SimpleNamespace(id=11, name="allgemein")
+    quiet = SimpleNamespace(id=12, name="spam")
+    guild = SimpleNamespace(id=1, text_channels=[SimpleNamespace(id=10, name=main.Config.BOT_CHANNEL), general, quiet])
+    authors = [SimpleNamespace(id=100 + i, name=f"user{i}", bot=False) for i in range(50)]
+    main.message_router.untracked_channels.add(quiet.name)
+
+    def traffic(channel, offset: int):
+        return [
+            make_message(offset + i, guild, channel, authors[i % len(authors)], f"Nachricht {i} über irgendwas")
+            for i in range(count)
+        ]
+
+    await measure("Unbeteiligter Kanal, mit Tracking", traffic(general, 0))
+    await measure("Unbeteiligter Kanal, ohne Tracking", traffic(quiet, count))
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000))
@@ -0,0 +1,99 @@
+import discord
+from typing import Dict, List, Optional
+
+class _GuildChannels:
+    """Kanäle eines Servers, nach kleingeschriebenem Namen indiziert"""
+
+    def __init__(self):
+        # Name -> {Channel-ID: Channel}; bei gleichen Namen gewinnt der zuerst gesehene
+        self.by_name: Dict[str, Dict[int, discord.abc.GuildChannel]] = {}
+        self.text_by_name: Dict[str, Dict[int, discord.TextChannel]] = {}
+        self.categories_by_name: Dict[str, Dict[int, discord.CategoryChannel]] = {}
+
+    def _indexes_for(self, channel) -> List[Dict]:
+        indexes = [self.by_name]
+        if isinstance(channel, discord.TextChannel):
+            indexes.append(self.text_by_name)
+        elif isinstance(channel, discord.CategoryChannel):
+            indexes.append(self.categories_by_name)
+        return indexes
+
+    def add(self, channel):
+        key = channel.name.lower()
+        for index in self._indexes_for(channel):
+            index.setdefault(key, {})[channel.id] = channel
+
+    def remove(self, channel):
+        key = channel.name.lower()
+        for index in self._indexes_for(channel):
+            channels = index.get(key)
+            if channels is None:
+                continue
+            channels.pop(channel.id, None)
+            if not channels:
+                del index[key]
+
+    @staticmethod
+    def first(index: Dict, name: str):
+        channels = index.get(name.lower())
+        if not channels:
+            return None
+        return next(iter(channels.values()))
+
+class ChannelIndex:
+    """Schneller Zugriff auf Kanäle und Kategorien per Name, ohne guild.channels zu durchsuchen.
+
+    Wird über die Gateway-Events (Kanal erstellt/geändert/gelöscht) aktuell
+    gehalten und beim ersten Zugriff auf einen Server aufgebaut.
+    """
+
+    def __init__(self):
+        self._guilds: Dict[int, _GuildChannels] = {}
+
+    def _get(self, guild) -> _GuildChannels:
+        index = self._guilds.get(guild.id)
+        if index is None:
+            index = self.rebuild(guild)
+        return index
+
+    def rebuild(self, guild) -> _GuildChannels:
+        """Baut den Index eines Servers komplett neu auf"""
+        index = _GuildChannels()
+        for channel in guild.channels:
+            index.add(channel)
+        self._guilds[guild.id] = index
+        return index
+
+    def remove_guild(self, guild_id: int):
+        self._guilds.pop(guild_id, None)
+
+    def add_channel(self, channel):
+        self._get(channel.guild).add(channel)
+
+    def remove_channel(self, channel):
+        index = self._guilds.get(channel.guild.id)
+        if index is not None:
+            index.remove(channel)
+
+    def update_channel(self, before, after):
+        index = self._get(after.guild)
+        index.remove(before)
+        index.add(after)
+
+    def find_channel(self, guild, name: str):
+        """Beliebiger Kanal (auch Kategorie) mit diesem Namen, ohne Groß-/Kleinschreibung"""
+        return _GuildChannels.first(self._get(guild).by_name, name)
+
+    def find_text_channel(self, guild, name: str) -> Optional[discord.TextChannel]:
+        return _GuildChannels.first(self._get(guild).text_by_name, name)
+
+    def find_category(self, guild, name: str) -> Optional[discord.CategoryChannel]:
+        return _GuildChannels.first(self._get(guild).categories_by_name, name)
+
+    def text_channel_names(self, guild) -> List[str]:
+        """Namen aller Textkanäle des Servers"""
+        return [
+            channel.name
+            for channels in self._get(guild).text_by_name.values()
+            for channel in channels.values()
+        ]
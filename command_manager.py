@@ -1,89 +1,268 @@
 import json
 import os
-from discord.ext import commands
+import re
+from discord import app_commands
 import logging
 import discord
-import asyncio
-from typing import Optional, Dict, Any
+import time
+from typing import Optional, Dict, Any, Iterable, List
+from command_sync import CommandSyncCoordinator
+from journal_writer import get_journal_writer
+
+# Platzhalter in Antworten, an denen die Argumente eingesetzt werden
+_PLACEHOLDER = re.compile(r"\{args\}|\$\{input\}")
+
+# Slash Command, über den im Dispatcher-Modus alle eigenen Commands laufen
+DISPATCH_SLASH_COMMAND = "befehl"
+
+class CompiledCommand:
+    """Eigener Command mit schon beim Erstellen zerlegter Antwort"""
+    __slots__ = ('description', 'segments')
+
+    def __init__(self, description: str, response: str):
+        self.description = description
+        # Fester Text; zwischen zwei Teilen stand jeweils ein Platzhalter
+        self.segments = tuple(_PLACEHOLDER.split(response))
+
+    def render(self, args: str) -> str:
+        return args.join(self.segments)
 
 class CommandManager:
-    def __init__(self, bot):
+    def __init__(self, bot, syncer: Optional[CommandSyncCoordinator] = None,
+                 dispatcher: bool = False, max_per_guild: int = 50, guild_directory: str = "commands"):
         self.bot = bot
+        self.syncer = syncer or CommandSyncCoordinator(bot)
+        self.writer = get_journal_writer()
         self.commands_file = "commands.json"
-        self.commands: Dict[str, Dict[str, Any]] = {}
+        self.guild_directory = guild_directory  # Eine Datei pro Server, erst bei Bedarf gelesen
+        self.commands: Dict[str, Dict[str, Any]] = {}  # Globale Commands
+        self.guild_commands: Dict[str, Dict[str, Dict[str, Any]]] = {}  # Guild-ID -> Commands (nur Dispatcher)
         self.command_instances = {}
+        self.loaded = False
+        # Im Dispatcher-Modus gibt es kein Objekt pro Command, nur diese Tabelle
+        self.dispatcher = dispatcher
+        self.max_per_guild = max_per_guild
+        self.dispatch_table: Dict[Optional[int], Dict[str, CompiledCommand]] = {}
 
-    def get_commands_list(self) -> str:
+    def _guild_file(self, guild_id: int) -> str:
+        return os.path.join(self.guild_directory, f"{guild_id}.json")
+
+    def _guild(self, guild_id: int) -> Dict[str, Dict[str, Any]]:
+        """Commands eines Servers; die Datei wird beim ersten Zugriff gelesen"""
+        key = str(guild_id)
+        guild_commands = self.guild_commands.get(key)
+        if guild_commands is None:
+            guild_commands = {}
+            path = self._guild_file(guild_id)
+            if os.path.exists(path):
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        guild_commands = json.load(f)
+                except Exception as e:
+                    logging.error(f"Fehler beim Laden der Commands von Server {guild_id}: {str(e)}")
+            self.guild_commands[key] = guild_commands
+            self.dispatch_table[guild_id] = self._compile(guild_commands)
+        return guild_commands
+
+    def _save_guild(self, guild_id: int) -> bool:
+        """Schreibt nur die Datei dieses Servers (atomar, im Hintergrund)"""
+        try:
+            os.makedirs(self.guild_directory, exist_ok=True)
+            self.writer.replace(self._guild_file(guild_id), dict(self._guild(guild_id)))
+            return True
+        except Exception as e:
+            logging.error(f"Fehler beim Speichern der Commands von Server {guild_id}: {str(e)}")
+            return False
+
+    def _scope(self, guild_id: Optional[int]) -> Dict[str, Dict[str, Any]]:
+        """Gespeicherte Commands, zu denen ein neuer Command dieses Servers gehört"""
+        if self.dispatcher and guild_id is not None:
+            return self._guild(guild_id)
+        return self.commands
+
+    def _visible(self, guild_id: Optional[int]) -> Dict[str, Dict[str, Any]]:
+        """Alle Commands, die auf einem Server verfügbar sind"""
+        visible = dict(self.commands)
+        if self.dispatcher and guild_id is not None:
+            visible.update(self._guild(guild_id))
+        return visible
+
+    def command_names(self, guild_id: Optional[int] = None) -> Iterable[str]:
+        return self._visible(guild_id).keys()
+
+    def get_commands_list(self, guild_id: Optional[int] = None) -> str:
         """Gibt eine formatierte Liste aller Commands zurück"""
-        if not self.commands:
+        visible = self._visible(guild_id)
+        if not visible:
             return "Keine Commands verfügbar."
         
         result = "**Verfügbare Commands:**\n"
-        for name, data in self.commands.items():
+        for name, data in visible.items():
             result += f"• /{name} - {data['description']}\n"
         return result
 
     async def load_commands(self):
-        """Lädt gespeicherte Commands beim Start"""
+        """Lädt gespeicherte Commands beim Start und synchronisiert sie einmal gesammelt"""
+        if self.loaded:
+            return  # on_ready kommt bei jedem Reconnect, die Commands sind schon registriert
         try:
+            started = time.perf_counter()
             if os.path.exists(self.commands_file):
                 with open(self.commands_file, 'r', encoding='utf-8') as f:
-                    self.commands = json.load(f)
-                    for cmd_name, cmd_data in self.commands.items():
-                        success = await self.register_command(cmd_name, cmd_data)
-                        if success:
-                            logging.info(f"Command '{cmd_name}' erfolgreich geladen!")
-                        else:
-                            logging.error(f"Fehler beim Laden von Command '{cmd_name}'")
-                    logging.info(f"Erfolgreich {len(self.commands)} Commands geladen!")
+                    stored = json.load(f)
+                if set(stored) <= {"global", "guilds"} and all("response" not in v for v in stored.values()):
+                    self.commands = stored.get("global", {})
+                    self._migrate_guilds(stored.get("guilds", {}))
+                else:
+                    self.commands = stored
+            read_done = time.perf_counter()
+
+            if self.dispatcher:
+                # Server-Commands werden erst beim ersten Aufruf auf dem Server geladen
+                self.dispatch_table[None] = self._compile(self.commands)
+                self._register_dispatch_command()
+            else:
+                # Erst alles lokal registrieren, dann nur ein einziger Sync mit Discord
+                for cmd_name, cmd_data in self.commands.items():
+                    success = await self.register_command(cmd_name, cmd_data, sync=False)
+                    if success:
+                        logging.debug(f"Command '{cmd_name}' erfolgreich geladen!")
+                    else:
+                        logging.error(f"Fehler beim Laden von Command '{cmd_name}'")
+            register_done = time.perf_counter()
+
+            await self.syncer.sync_now()  # Entfällt, wenn sich seit dem letzten Start nichts geändert hat
+            sync_done = time.perf_counter()
+
+            self.loaded = True
+            logging.info(
+                f"Erfolgreich {len(self.commands)} globale Commands geladen! "
+                f"(Lesen {(read_done - started) * 1000:.0f} ms, "
+                f"Registrieren {(register_done - read_done) * 1000:.0f} ms, "
+                f"Sync {(sync_done - register_done) * 1000:.0f} ms)"
+            )
         except Exception as e:
             logging.error(f"Fehler beim Laden der Commands: {str(e)}")
 
+    def _migrate_guilds(self, guilds: Dict[str, Dict[str, Dict[str, Any]]]):
+        """Verschiebt Server-Commands aus commands.json in eigene Dateien"""
+        if not guilds:
+            return
+        for guild_id, guild_commands in guilds.items():
+            self.guild_commands[guild_id] = guild_commands
+            self.dispatch_table[int(guild_id)] = self._compile(guild_commands)
+            self._save_guild(int(guild_id))
+        self.save_commands()
+        logging.info(f"Commands von {len(guilds)} Servern in {self.guild_directory}/ verschoben")
+
+    @staticmethod
+    def _compile(stored: Dict[str, Dict[str, Any]]) -> Dict[str, CompiledCommand]:
+        return {name: CompiledCommand(data["description"], data["response"]) for name, data in stored.items()}
+
+    def _lookup(self, guild_id: Optional[int], name: str) -> Optional[CompiledCommand]:
+        if guild_id is not None:
+            self._guild(guild_id)
+        command = self.dispatch_table.get(guild_id, {}).get(name)
+        if command is None:
+            command = self.dispatch_table.get(None, {}).get(name)
+        return command
+
+    async def dispatch(self, message) -> bool:
+        """Beantwortet einen eigenen Command per Tabelle; False, wenn es keiner war"""
+        prefix = self.bot.command_prefix
+        if not self.dispatcher or not isinstance(prefix, str) or not message.content.startswith(prefix):
+            return False
+        name, _, args = message.content[len(prefix):].partition(" ")
+        guild_id = message.guild.id if message.guild else None
+        command = self._lookup(guild_id, name)
+        if command is None:
+            return False
+        try:
+            await message.channel.send(command.render(args.strip()))
+        except Exception as e:
+            await message.channel.send(f"Fehler beim Ausführen des Commands: {str(e)}")
+        return True
+
+    def _register_dispatch_command(self):
+        """Ein einziger Slash Command für alle eigenen Commands"""
+        async def run_command(interaction: discord.Interaction, name: str, args: str = ""):
+            command = self._lookup(interaction.guild_id, name)
+            if command is None:
+                await interaction.response.send_message(f"Command '{name}' existiert nicht!", ephemeral=True)
+                return
+            await interaction.response.send_message(command.render(args))
+
+        async def complete_name(interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
+            names = self.command_names(interaction.guild_id)
+            return [app_commands.Choice(name=n, value=n) for n in names if n.startswith(current)][:25]
+
+        command = app_commands.Command(
+            name=DISPATCH_SLASH_COMMAND,
+            description="Führt einen eigenen Command aus",
+            callback=run_command
+        )
+        command.autocomplete("name")(complete_name)
+        self.bot.tree.add_command(command, override=True)
+
+
     def save_commands(self):
-        """Speichert Commands in eine JSON-Datei"""
+        """Speichert die globalen Commands (atomar, im Hintergrund)"""
         try:
-            with open(self.commands_file, 'w', encoding='utf-8') as f:
-                json.dump(self.commands, f, indent=4, ensure_ascii=False)
+            self.writer.replace(self.commands_file, dict(self.commands))
             return True
         except Exception as e:
             logging.error(f"Fehler beim Speichern der Commands: {str(e)}")
             return False
 
-    async def create_command(self, name: str, description: str, response: str):
+    async def create_command(self, name: str, description: str, response: str, guild_id: Optional[int] = None):
         """Erstellt einen neuen Command"""
         try:
             # Lösche existierenden Command falls vorhanden
-            if name in self.commands:
-                await self.delete_command(name)
+            if name in self._scope(guild_id):
+                await self.delete_command(name, guild_id)
+            scope = self._scope(guild_id)
             
             # Validiere Command-Name
             if not name.replace('-', '').replace('_', '').isalnum():
                 raise ValueError("Command-Name darf nur Buchstaben, Zahlen, Unterstriche und Bindestriche enthalten!")
+            # Das Limit gilt nur für die eigenen Commands eines Servers, nicht für globale
+            if scope is not self.commands and len(scope) >= self.max_per_guild:
+                raise ValueError(f"Maximal {self.max_per_guild} Commands pro Server erlaubt!")
 
-            self.commands[name] = {
+            scope[name] = {
                 "description": description,
                 "response": response
             }
             
-            # Registriere und speichere Command
-            success = await self.register_command(name, self.commands[name])
-            if success and self.save_commands():
+            if self.dispatcher:
+                # Nur ein Tabelleneintrag, am Command-Tree ändert sich nichts
+                table_key = guild_id if scope is not self.commands else None
+                self.dispatch_table.setdefault(table_key, {})[name] = CompiledCommand(description, response)
+                success = True
+            else:
+                # Registriere und speichere Command
+                success = await self.register_command(name, scope[name])
+            saved = self.save_commands() if scope is self.commands else self._save_guild(guild_id)
+            if success and saved:
                 return True
             
-            # Wenn etwas fehlschlägt, Command rückgängig machen
-            del self.commands[name]
+            # Wenn etwas fehlschlägt, Command rückgängig machen (auch in der Dispatch-Tabelle)
+            del scope[name]
+            if self.dispatcher:
+                self.dispatch_table.get(table_key, {}).pop(name, None)
             return False
                 
         except Exception as e:
             raise Exception(f"Fehler beim Erstellen des Commands: {str(e)}")
 
-    async def register_command(self, name: str, cmd_data: dict):
-        """Registriert einen Command beim Bot"""
+    async def register_command(self, name: str, cmd_data: dict, sync: bool = True):
+        """Registriert einen Command beim Bot; mit sync=False nur lokal"""
         try:
             # Entferne existierende Command-Instanzen
             if name in self.command_instances:
                 self.bot.remove_command(name)
                 del self.command_instances[name]
+            self.bot.tree.remove_command(name)
 
             # Definiere den Command-Callback
             async def command_callback(ctx, *, args=""):
@@ -111,10 +290,8 @@ class CommandManager:
                 response = response.replace("${input}", args)
                 await interaction.response.send_message(response)
 
-            try:
-                await self.bot.tree.sync()
-            except Exception as e:
-                logging.warning(f"Fehler beim Synchronisieren der Slash Commands: {str(e)}")
+            if sync:
+                self.syncer.request()
 
             return True
             
@@ -122,9 +299,12 @@ class CommandManager:
             logging.error(f"Fehler beim Registrieren des Commands '{name}': {str(e)}")
             return False
 
-    async def delete_command(self, name: str):
+    async def delete_command(self, name: str, guild_id: Optional[int] = None):
         """Löscht einen existierenden Command"""
         try:
+            if self.dispatcher:
+                return self._delete_from_table(name, guild_id)
+
             if name not in self.commands:
                 raise ValueError(f"Command '{name}' existiert nicht!")
             
@@ -132,19 +312,30 @@ class CommandManager:
             if name in self.command_instances:
                 self.bot.remove_command(name)
                 del self.command_instances[name]
+            self.bot.tree.remove_command(name)  # Sonst bliebe der Slash Command nach dem Sync bestehen
             
             # Entferne Command aus der Speicherung
             del self.commands[name]
             
             # Speichere Änderungen
             if self.save_commands():
-                try:
-                    await self.bot.tree.sync()
-                except Exception as e:
-                    logging.warning(f"Fehler beim Synchronisieren der Slash Commands: {str(e)}")
+                self.syncer.request()
                 return True
             
             return False
                 
         except Exception as e:
-            raise Exception(f"Fehler beim Löschen des Commands: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Fehler beim Löschen des Commands: {str(e)}")
+
+    def _delete_from_table(self, name: str, guild_id: Optional[int]) -> bool:
+        # Zuerst der Command des Servers, sonst ein globaler gleichen Namens
+        guild_commands = self._guild(guild_id) if guild_id is not None else {}
+        if name in guild_commands:
+            del guild_commands[name]
+            self.dispatch_table[guild_id].pop(name, None)
+            return self._save_guild(guild_id)
+        if name in self.commands:
+            del self.commands[name]
+            self.dispatch_table.get(None, {}).pop(name, None)
+            return self.save_commands()
+        raise ValueError(f"Command '{name}' existiert nicht!")
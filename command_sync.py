@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+class CommandSyncCoordinator:
+    """Bündelt Syncs des Command-Trees mit Discord.
+
+    Änderungen in kurzer Folge lösen nach `delay` Sekunden Ruhe nur einen Sync
+    aus. Vor jedem Sync wird ein Hash des Trees gebildet; stimmt er mit dem
+    zuletzt erfolgreich synchronisierten überein (auch über Neustarts hinweg),
+    entfällt der Sync ganz.
+    """
+
+    def __init__(self, bot, state_file: str = "command_sync.json", delay: float = 2.0):
+        self.bot = bot
+        self.state_file = state_file
+        self.delay = delay
+        self.synced_hash: Optional[str] = self._load_hash()
+        self._pending: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.requests = 0
+        self.syncs = 0
+        self.skipped = 0
+        self.failures = 0
+        self.last_duration = 0.0
+        self.total_duration = 0.0
+
+    def _load_hash(self) -> Optional[str]:
+        try:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    return json.load(f).get('hash')
+        except Exception as e:
+            logging.warning(f"Sync-Status konnte nicht gelesen werden: {str(e)}")
+        return None
+
+    def _save_hash(self):
+        try:
+            with open(self.state_file, 'w', encoding='utf-8') as f:
+                json.dump({'hash': self.synced_hash}, f)
+        except Exception as e:
+            logging.warning(f"Sync-Status konnte nicht gespeichert werden: {str(e)}")
+
+    def tree_hash(self) -> str:
+        """Fingerabdruck aller Slash Commands, so wie sie an Discord gehen"""
+        tree = self.bot.tree
+        payload = sorted(
+            (command.to_dict(tree) for command in tree.get_commands()),
+            key=lambda command: (command['name'], command.get('type', 1))
+        )
+        digest = hashlib.sha256()
+        digest.update(str(self.bot.application_id).encode('utf-8'))
+        digest.update(json.dumps(payload, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()
+
+    def request(self):
+        """Fordert einen Sync an; mehrere Anfragen kurz hintereinander ergeben einen Sync"""
+        self.requests += 1
+        if self._pending is not None and not self._pending.done():
+            self._pending.cancel()
+        self._pending = asyncio.create_task(self._sync_later())
+
+    async def _sync_later(self):
+        await asyncio.sleep(self.delay)
+        # Ab hier nicht mehr abbrechen lassen, ein angefangener Sync läuft zu Ende
+        await asyncio.shield(self.sync_now())
+
+    async def flush(self):
+        """Führt einen angeforderten Sync sofort aus"""
+        if self._pending is not None and not self._pending.done():
+            self._pending.cancel()
+            self._pending = None
+            await self.sync_now()
+
+    async def sync_now(self) -> bool:
+        """Synchronisiert, falls sich der Tree seit dem letzten Sync geändert hat"""
+        async with self._lock:
+            tree_hash = self.tree_hash()
+            if tree_hash == self.synced_hash:
+                self.skipped += 1
+                logging.info("Slash Commands unverändert, Sync übersprungen")
+                return True
+
+            started = time.perf_counter()
+            try:
+                await self.bot.tree.sync()
+            except Exception as e:
+                self.failures += 1
+                logging.warning(f"Fehler beim Synchronisieren der Slash Commands: {str(e)}")
+                return False
+            finally:
+                self.last_duration = time.perf_counter() - started
+                self.total_duration += self.last_duration
+
+            self.syncs += 1
+            self.synced_hash = tree_hash
+            self._save_hash()
+            logging.info(f"Slash Commands synchronisiert in {self.last_duration * 1000:.0f} ms: {self.get_stats()}")
+            return True
+
+    def get_stats(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'syncs': self.syncs,
+            'skipped': self.skipped,
+            'failures': self.failures,
+            'last_duration': self.last_duration,
+            'total_duration': self.total_duration
+        }
@@ -8,10 +8,77 @@ class Config:
     OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3.1')
     BOT_CHANNEL = "bot"
     COMMAND_PREFIX = "/"
-    LOG_FILE = "bot.log"
     
     # Neue Konfigurationsoptionen
-    ALLOWED_CHANNELS = ["bot", "bot-config", "bot-commands"]  # Kanäle in denen der Bot reagiert
+    ALLOWED_CHANNELS = ["bot", "bot-config", "bot-commands"]  # Kanäle in denen der Bot auf Erwähnung und Prefix reagiert, leer = überall
+    UNTRACKED_CHANNELS = []  # Kanäle, deren Nachrichten nicht gespeichert werden
     MAX_COMMANDS_PER_SERVER = 50  # Maximale Anzahl eigener Commands pro Server
     COMMAND_COOLDOWN = 3  # Sekunden zwischen Command-Ausführungen
-    DEBUG_MODE = False  # Debug-Modus für zusätzliche Logging-Informationen
\ No newline at end of file
+    DEBUG_MODE = False  # Debug-Modus für zusätzliche Logging-Informationen
+    COMMAND_DISPATCHER = os.getenv('COMMAND_DISPATCHER', 'false').lower() == 'true'  # Eigene Commands pro Server über eine Tabelle statt einzeln registriert
+    COMMAND_SYNC_DELAY = 2.0  # Sekunden Ruhe, nach denen gesammelte Command-Änderungen synchronisiert werden
+    COMMAND_SYNC_STATE_FILE = "command_sync.json"  # Hash des zuletzt synchronisierten Command-Trees
+    COMMAND_GUILD_DIRECTORY = "commands"  # Eine Datei pro Server mit dessen eigenen Commands
+
+    # Logging
+    LOG_FILE = "bot.log"
+    LOG_JSON = os.getenv('LOG_JSON', 'false').lower() == 'true'  # Eine JSON-Zeile pro Eintrag statt Text
+    LOG_MAX_BYTES = 10 * 1024 * 1024  # Größe, ab der die Logdatei rotiert wird
+    LOG_BACKUP_COUNT = 5  # Anzahl aufbewahrter alter Logdateien
+    LOG_QUEUE_SIZE = 10000  # Wartende Einträge, bevor neue verworfen werden
+    LOG_MAX_LENGTH = 4000  # Zeichen pro Eintrag, der Rest wird abgeschnitten (0 = unbegrenzt)
+    LOG_PAYLOAD_MAX_LENGTH = 1000  # Zeichen für Prompts und KI-Antworten
+    LOG_PAYLOAD_SAMPLE_EVERY = {"prompt": 10, "response": 1}  # Nur jeder n-te Eintrag dieser Art wird geloggt
+
+    # Ollama-Client
+    OLLAMA_HOST = os.getenv('OLLAMA_API_URL', 'http://localhost:11434')
+    LLM_MAX_CONCURRENT_REQUESTS = int(os.getenv('LLM_MAX_CONCURRENT_REQUESTS', '2'))  # Gleichzeitige KI-Anfragen
+    LLM_MAX_CONNECTIONS = 10  # Größe des HTTP-Connection-Pools
+    LLM_REQUEST_TIMEOUT = float(os.getenv('LLM_REQUEST_TIMEOUT', '120'))  # Sekunden pro KI-Anfrage
+    LLM_STREAMING = os.getenv('LLM_STREAMING', 'true').lower() == 'true'  # Aktionen schon während der Generierung ausführen
+    OLLAMA_KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '30m')  # Modell samt Prompt-Cache so lange im Speicher halten
+    OLLAMA_NUM_CTX = int(os.getenv('OLLAMA_NUM_CTX', '0'))  # Feste Kontextgröße, 0 = Standard des Modells
+
+    # Antwort-Cache für wiederkehrende Anfragen
+    RESPONSE_CACHE_SIZE = 256  # Maximale Anzahl gespeicherter Antworten, 0 = aus
+    RESPONSE_CACHE_TTL = 600  # Sekunden, die eine Antwort gültig bleibt
+
+    # Warteschlange vor der KI
+    SCHEDULER_MAX_CONCURRENT = LLM_MAX_CONCURRENT_REQUESTS  # Gleichzeitig bearbeitete Anfragen
+    SCHEDULER_MAX_QUEUE = 50  # Maximal wartende Anfragen insgesamt
+    SCHEDULER_MAX_QUEUE_PER_GUILD = 10  # Maximal wartende Anfragen pro Server
+
+    # Begrenzung der Anfragen an den Bot (Token-Bucket)
+    RATE_LIMIT_USER_BURST = 3  # Anfragen, die ein User direkt hintereinander stellen darf
+    RATE_LIMIT_USER_RATE = 1 / COMMAND_COOLDOWN  # Danach eine Anfrage pro COMMAND_COOLDOWN Sekunden
+    RATE_LIMIT_CHANNEL_BURST = 10  # Anfragen pro Kanal am Stück
+    RATE_LIMIT_CHANNEL_RATE = 0.5  # Nachgefüllte Anfragen pro Sekunde und Kanal
+    RATE_LIMIT_GUILD_BURST = 20  # Anfragen pro Server am Stück
+    RATE_LIMIT_GUILD_RATE = 1.0  # Nachgefüllte Anfragen pro Sekunde und Server
+
+    # Regelbasierter Fast-Path ohne KI
+    INTENT_ROUTER_THRESHOLD = 0.8  # Mindest-Konfidenz, ab der eine Regel die KI ersetzt (über 1 = aus)
+
+    # Ausführung der Aktionen
+    ACTION_MAX_CONCURRENCY = 4  # Unabhängige Aktionen, die gleichzeitig laufen dürfen
+
+    # Fortschrittsanzeige
+    PROGRESS_EDIT_INTERVAL = 1.5  # Mindestabstand zwischen zwei Edits in Sekunden
+    PROGRESS_USE_TYPING = True  # Erst "schreibt..." anzeigen statt sofort einer Platzhalter-Nachricht
+    PROGRESS_PLACEHOLDER_DELAY = 2.0  # Sekunden, nach denen doch ein Platzhalter erscheint
+
+    # KI-Gedächtnis
+    MEMORY_COMPACT_EVERY = 200  # Journal-Einträge, nach denen ein neuer Snapshot geschrieben wird
+    MEMORY_DIRECTORY = "ai_memory"  # Ein Gedächtnis pro Server und Kanal in diesem Ordner
+    MEMORY_LEGACY_FILE = "ai_memory.json"  # Altes globales Gedächtnis, Startstand für neue Partitionen
+    MEMORY_PER_USER = False  # Zusätzlich pro User trennen
+    MEMORY_MAX_RESIDENT = 256  # Gedächtnisse, die gleichzeitig im RAM bleiben
+    MEMORY_MAX_INTERACTIONS = 10000  # Interaktionen, die insgesamt im RAM gehalten werden
+
+    # Nachrichtenverlauf
+    TRACKER_MAX_BYTES = 64 * 1024 * 1024  # Geschätzter Speicher für alle getrackten Nachrichten und User
+    ARCHIVE_DIRECTORY = "message_archive"  # Nachrichten aller Server auf der Platte, auch nach einem Neustart
+    ARCHIVE_SEGMENT_SIZE = 16 * 1024 * 1024  # Bytes pro Segmentdatei
+    ARCHIVE_MAX_SEGMENTS = 64  # Segmente pro Server, danach wird das älteste gelöscht
+    ARCHIVE_MAX_MAPPED = 16  # Segmente, die gleichzeitig per mmap offen bleiben
+    ARCHIVE_SEARCH_BUDGET = 1.0  # Sekunden, nach denen eine Archivsuche mit den bisherigen Treffern endet
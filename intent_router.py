@@ -0,0 +1,101 @@
+import re
+from typing import Dict, List, Optional, Tuple
+from response_cache import normalize_input
+
+# Höflichkeits- und Füllwörter, die eine Anfrage nicht verändern
+FILLER_WORDS = {
+    "bitte", "mal", "doch", "kurz", "einmal", "jetzt", "an", "hey", "hi", "hallo", "danke",
+    "please", "pls", "now", "bot",
+}
+
+def strip_filler(text: str) -> str:
+    return " ".join(word for word in text.split() if word not in FILLER_WORDS)
+
+class IntentRule:
+    """Eine Regel, die eine Anfrage ohne KI direkt einer Aktion zuordnet.
+
+    Ein Muster muss die ganze Anfrage abdecken (bis auf Füllwörter), sonst
+    könnte "zeige mir die rollen von max" als Rollenanalyse durchgehen.
+    """
+
+    def __init__(self, action: str, patterns: List[str], params: Optional[Dict] = None, weight: float = 1.0):
+        self.action = action
+        self.patterns = [re.compile(p) for p in patterns]
+        self.params = params or {}
+        self.weight = weight
+
+    def score(self, text: str) -> float:
+        """Konfidenz zwischen 0 und 1; 0, wenn kein Muster die ganze Anfrage abdeckt"""
+        if any(pattern.fullmatch(text) for pattern in self.patterns):
+            return self.weight
+        return 0.0
+
+_SHOW = r"(?:(?:zeig|zeige|liste|list|nenn|nenne|show|give)\s+(?:mir\s+|me\s+)?(?:alle\s+|all\s+|die\s+|the\s+)?)"
+# Optionaler Ort am Ende, z.B. "zeig alle rollen auf dem server"
+_WHERE = r"(?:\s+(?:auf|in|on)\s+(?:dem|diesem|the|this)\s+server|\s+hier|\s+here)?"
+
+DEFAULT_RULES = [
+    IntentRule("list_commands", [
+        _SHOW + r"(?:commands|befehle)" + _WHERE,
+        r"(?:commands|befehle)\s+(?:auflisten|anzeigen|zeigen)",
+        r"welche\s+(?:commands|befehle)\s+(?:gibt\s+es|hast\s+du|kennst\s+du)",
+        r"what\s+commands\s+(?:are\s+there|do\s+you\s+have)",
+        r"(?:commands|befehle|command\s+list|befehlsliste)",
+    ], {"show": "all"}),
+    IntentRule("analyze_channels", [
+        r"analysiere\s+(?:die\s+|alle\s+)?(?:kanäle|channels)" + _WHERE,
+        r"analy[sz]e\s+(?:the\s+|all\s+)?channels" + _WHERE,
+        _SHOW + r"(?:kanäle|channels)" + _WHERE,
+        r"(?:kanalanalyse|channel\s+analysis)",
+    ]),
+    IntentRule("analyze_roles", [
+        r"analysiere\s+(?:die\s+|alle\s+)?rollen" + _WHERE,
+        r"analy[sz]e\s+(?:the\s+|all\s+)?roles" + _WHERE,
+        _SHOW + r"(?:rollen|roles)" + _WHERE,
+        r"(?:rollenanalyse|role\s+analysis)",
+    ]),
+    IntentRule("list_users", [
+        _SHOW + r"(?:user|nutzer|benutzer|mitglieder|users|members)" + _WHERE,
+        r"wer\s+ist\s+(?:alles\s+)?(?:hier|auf\s+dem\s+server)",
+        r"who\s+is\s+(?:here|on\s+(?:the|this)\s+server)",
+    ]),
+]
+
+class IntentRouter:
+    """Leitet eindeutige Anfragen direkt an handle_action weiter, alles andere geht an die KI"""
+
+    def __init__(self, rules: Optional[List[IntentRule]] = None, threshold: float = 0.8):
+        self.rules: List[IntentRule] = list(DEFAULT_RULES if rules is None else rules)
+        self.threshold = threshold
+        self.total = 0
+        self.routed = 0
+
+    def add_rule(self, rule: IntentRule):
+        self.rules.append(rule)
+
+    def route(self, user_input: str) -> Optional[Tuple[str, Dict, float]]:
+        """Gibt (Aktion, Parameter, Konfidenz) zurück oder None, wenn die KI ran muss"""
+        self.total += 1
+        text = strip_filler(normalize_input(user_input))
+        if not text:
+            return None
+
+        best_rule = None
+        best_score = 0.0
+        for rule in self.rules:
+            score = rule.score(text)
+            if score > best_score:
+                best_rule, best_score = rule, score
+
+        if best_rule is None or best_score < self.threshold:
+            return None
+
+        self.routed += 1
+        return best_rule.action, dict(best_rule.params), best_score
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            'total': self.total,
+            'fast_path': self.routed,
+            'fast_path_rate': (self.routed / self.total * 100) if self.total else 0.0
+        }
@@ -0,0 +1,160 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+def load_journal(snapshot_path: str, journal_path: str) -> Tuple[Dict, List[Dict]]:
+    """Liest Snapshot und die Journal-Einträge, die danach geschrieben wurden.
+
+    Einträge, die schon im Snapshot stecken (seq <= last_seq), werden übersprungen.
+    Eine abgeschnittene letzte Zeile (Absturz beim Schreiben) wird ignoriert.
+    """
+    snapshot: Dict = {}
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+
+    last_seq = snapshot.get('last_seq', 0)
+    records = []
+    if os.path.exists(journal_path):
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logging.warning(f"Unvollständiger Journal-Eintrag in {journal_path} übersprungen")
+                    continue
+                if record.get('seq', 0) > last_seq:
+                    records.append(record)
+    return snapshot, records
+
+class JournalWriter:
+    """Schreibt Journal-Einträge und Snapshots in einem Hintergrund-Thread.
+
+    Einträge werden gesammelt und gebündelt angehängt. Ein Snapshot wird
+    atomar per os.replace geschrieben, danach wird das Journal geleert.
+    """
+    _STOP = object()
+
+    def __init__(self, flush_interval: float = 0.5, max_batch: int = 500):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.written = 0
+        self.compactions = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def append(self, journal_path: str, record: Dict):
+        """Hängt einen Eintrag an (kehrt sofort zurück)"""
+        self._queue.put(('append', journal_path, None, record))
+
+    def compact(self, journal_path: str, snapshot_path: str, snapshot: Dict):
+        """Ersetzt den Snapshot und leert das Journal (kehrt sofort zurück)"""
+        self._queue.put(('compact', journal_path, snapshot_path, snapshot))
+
+    def replace(self, path: str, data: Dict):
+        """Ersetzt eine JSON-Datei atomar (kehrt sofort zurück); data danach nicht mehr verändern"""
+        self._queue.put(('replace', None, path, data))
+
+    def notify(self, callback: Callable[[], None]):
+        """Ruft callback im Schreib-Thread auf, sobald alles bisher Eingereichte geschrieben ist"""
+        self._queue.put(('notify', None, None, callback))
+
+    def flush(self, timeout: Optional[float] = None):
+        """Wartet, bis alles bisher Eingereichte geschrieben ist"""
+        if not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(('flush', None, None, done))
+        done.wait(timeout)
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            # Auf flush() und close() wird gewartet, also nicht weiter sammeln
+            while len(batch) < self.max_batch and batch[-1] is not self._STOP and batch[-1][0] != 'flush':
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            stop = batch[-1] is self._STOP
+            if stop:
+                batch.pop()
+            self._write_batch(batch)
+            if stop:
+                return
+
+    def _write_batch(self, batch):
+        handles = {}
+        # Wird eine Datei im selben Batch mehrmals ersetzt, zählt nur der letzte Stand
+        last_replace = {item[2]: i for i, item in enumerate(batch) if item[0] == 'replace'}
+        try:
+            for i, (kind, journal_path, snapshot_path, payload) in enumerate(batch):
+                try:
+                    if kind == 'append':
+                        handle = handles.get(journal_path)
+                        if handle is None:
+                            handle = handles[journal_path] = open(journal_path, 'a', encoding='utf-8')
+                        handle.write(json.dumps(payload, ensure_ascii=False) + "\n")
+                        self.written += 1
+                    elif kind == 'compact':
+                        handle = handles.pop(journal_path, None)
+                        if handle is not None:
+                            handle.close()
+                        self._write_snapshot(journal_path, snapshot_path, payload)
+                    elif kind == 'replace':
+                        if last_replace[snapshot_path] == i:
+                            self._write_json(snapshot_path, payload, indent=None)
+                    elif kind in ('flush', 'notify'):
+                        try:
+                            for handle in handles.values():
+                                handle.flush()
+                        finally:
+                            if kind == 'flush':
+                                payload.set()
+                            else:
+                                payload()
+                except Exception as e:
+                    logging.error(f"Fehler beim Schreiben von {journal_path or snapshot_path}: {str(e)}")
+        finally:
+            for handle in handles.values():
+                handle.close()
+
+    def _write_json(self, path: str, data: Dict, indent: Optional[int] = 4):
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=indent, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+    def _write_snapshot(self, journal_path: str, snapshot_path: str, snapshot: Dict):
+        self._write_json(snapshot_path, snapshot)
+        # Erst nach dem Snapshot leeren; stürzt der Bot dazwischen ab, filtert seq doppelte Einträge
+        open(journal_path, 'w', encoding='utf-8').close()
+        self.compactions += 1
+
+_default_writer: Optional[JournalWriter] = None
+
+def get_journal_writer() -> JournalWriter:
+    """Gemeinsamer Writer-Thread für alle Journale des Bots"""
+    global _default_writer
+    if _default_writer is None:
+        _default_writer = JournalWriter()
+    return _default_writer
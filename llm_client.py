@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import httpx
+import ollama
+from typing import AsyncIterator, Dict, List, Optional, Set
+from config import Config
+
+class LLMClient:
+    """Asynchroner Ollama-Client mit Connection-Pool und begrenzter Parallelität"""
+
+    def __init__(self, host: Optional[str] = None, model: Optional[str] = None,
+                 max_concurrent: Optional[int] = None, timeout: Optional[float] = None,
+                 max_connections: Optional[int] = None):
+        self.host = host or Config.OLLAMA_HOST
+        self.model = model or Config.OLLAMA_MODEL
+        self.timeout = timeout or Config.LLM_REQUEST_TIMEOUT
+        self.max_concurrent = max_concurrent or Config.LLM_MAX_CONCURRENT_REQUESTS
+        self.keep_alive = Config.OLLAMA_KEEP_ALIVE
+        # Gleichbleibende Optionen, sonst lädt Ollama das Modell neu und verwirft den Cache
+        self.options = {'num_ctx': Config.OLLAMA_NUM_CTX} if Config.OLLAMA_NUM_CTX else None
+        max_connections = max_connections or Config.LLM_MAX_CONNECTIONS
+
+        # Ein einziger AsyncClient hält die HTTP-Verbindungen zu Ollama offen
+        self._client = ollama.AsyncClient(
+            host=self.host,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            )
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._pending: Set[asyncio.Task] = set()
+
+    @property
+    def in_flight(self) -> int:
+        """Anzahl der aktuell laufenden oder wartenden Anfragen"""
+        return len(self._pending)
+
+    async def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """Schickt eine Chat-Anfrage an Ollama und gibt den Antworttext zurück"""
+        task = asyncio.ensure_future(self._chat(messages, **kwargs))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        try:
+            return await task
+        except asyncio.CancelledError:
+            # Wird der Aufrufer abgebrochen, bricht auch die Generierung ab
+            task.cancel()
+            raise
+
+    async def _chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        async with self._semaphore:
+            try:
+                response = await asyncio.wait_for(
+                    self._client.chat(
+                        model=self.model, messages=messages,
+                        keep_alive=self.keep_alive, options=self.options, **kwargs
+                    ),
+                    timeout=self.timeout
+                )
+            except asyncio.TimeoutError:
+                raise self._timeout_error() from None
+        self._log_prompt_stats(response)
+        return response['message']['content']
+
+    async def stream_chat(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """Schickt eine Chat-Anfrage an Ollama und liefert die Antwort stückweise"""
+        # Die Generierung läuft als eigener Task, damit cancel_all() und close() sie erreichen
+        chunks: asyncio.Queue = asyncio.Queue()
+        task = asyncio.ensure_future(self._stream_chat(chunks, messages, **kwargs))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    break
+                yield chunk
+            await task  # Fehler oder Abbruch der Generierung an den Aufrufer weitergeben
+        finally:
+            # Hört der Aufrufer vorher auf, bricht auch die Generierung ab
+            if task.done() and not task.cancelled():
+                task.exception()  # Abgerufen, sonst warnt asyncio über einen nie gelesenen Fehler
+            task.cancel()
+
+    async def _stream_chat(self, chunks: asyncio.Queue, messages: List[Dict[str, str]], **kwargs):
+        try:
+            async with self._semaphore:
+                loop = asyncio.get_running_loop()
+                deadline = loop.time() + self.timeout
+                stream = await self._client.chat(
+                    model=self.model, messages=messages, stream=True,
+                    keep_alive=self.keep_alive, options=self.options, **kwargs
+                )
+                try:
+                    while True:
+                        # Das Zeitlimit gilt für die gesamte Generierung, nicht pro Token
+                        remaining = max(deadline - loop.time(), 0)
+                        try:
+                            part = await asyncio.wait_for(stream.__anext__(), timeout=remaining)
+                        except StopAsyncIteration:
+                            break
+                        except asyncio.TimeoutError:
+                            raise self._timeout_error() from None
+                        content = part['message']['content']
+                        if content:
+                            chunks.put_nowait(content)
+                        if part.get('done'):
+                            self._log_prompt_stats(part)
+                finally:
+                    await stream.aclose()
+        finally:
+            chunks.put_nowait(None)  # Ende, auch bei Fehler oder Abbruch
+
+    def _log_prompt_stats(self, response):
+        # prompt_eval_count zeigt, wie viele Tokens nicht aus dem Cache kamen
+        logging.debug(
+            f"Prompt ausgewertet: {response.get('prompt_eval_count')} Tokens "
+            f"in {(response.get('prompt_eval_duration') or 0) / 1e6:.0f}ms"
+        )
+
+    def _timeout_error(self) -> TimeoutError:
+        logging.error(f"KI-Anfrage nach {self.timeout}s abgebrochen")
+        return TimeoutError(
+            f"Die KI hat nicht innerhalb von {self.timeout:g} Sekunden geantwortet!"
+        )
+
+    def cancel_all(self):
+        """Bricht alle laufenden Anfragen ab"""
+        for task in list(self._pending):
+            task.cancel()
+
+    async def close(self):
+        """Bricht offene Anfragen ab und schließt den Connection-Pool"""
+        self.cancel_all()
+        await self._client.close()
@@ -0,0 +1,133 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+class PayloadPolicy(logging.Filter):
+    """Kürzt lange Log-Nachrichten und loggt große Payloads nur stichprobenartig.
+
+    Payloads werden beim Loggen mit extra={'payload': 'prompt'} o.ä. markiert.
+    Von jeder Art wird nur jeder n-te Eintrag (laut `sample_every`) geschrieben;
+    verworfene werden gar nicht erst formatiert.
+    """
+
+    def __init__(self, max_length: int, payload_max_length: int, sample_every: Optional[Dict[str, int]] = None):
+        super().__init__()
+        self.max_length = max_length
+        self.payload_max_length = payload_max_length
+        self.sample_every = sample_every or {}
+        self._seen: Dict[str, int] = {}
+        self.sampled_out = 0
+        self.truncated = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        payload = getattr(record, 'payload', None)
+        limit = self.max_length
+        if payload is not None:
+            seen = self._seen.get(payload, 0)
+            self._seen[payload] = seen + 1
+            if seen % self.sample_every.get(payload, 1):
+                self.sampled_out += 1
+                return False
+            limit = self.payload_max_length
+
+        message = record.getMessage()
+        if limit and len(message) > limit:
+            record.msg = f"{message[:limit]}… [{len(message) - limit} Zeichen gekürzt]"
+            record.args = None
+            self.truncated += 1
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """Eine JSON-Zeile pro Eintrag"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        payload = getattr(record, 'payload', None)
+        if payload is not None:
+            entry['payload'] = payload
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+_EXCEPTION_FORMATTER = logging.Formatter()
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """Reicht Einträge an den Schreib-Thread weiter; ist die Queue voll, wird verworfen statt gewartet"""
+
+    def __init__(self, log_queue: queue.Queue, policy: PayloadPolicy):
+        super().__init__(log_queue)
+        self.policy = policy
+        self.addFilter(policy)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Nur die Nachricht einsetzen; Zeitstempel und Format setzt der Schreib-Thread
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _EXCEPTION_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            'queued': self.queue.qsize(),
+            'dropped': self.dropped,
+            'sampled_out': self.policy.sampled_out,
+            'truncated': self.policy.truncated
+        }
+
+def setup_logging(log_file: str, level: int = logging.INFO, json_lines: bool = False,
+                  max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5, queue_size: int = 10000,
+                  max_length: int = 4000, payload_max_length: int = 1000,
+                  sample_every: Optional[Dict[str, int]] = None) -> LogQueueHandler:
+    """Leitet alle Logs über eine Queue an einen Thread, der Datei und Konsole schreibt.
+
+    Der Event-Loop legt Einträge nur in die Queue; Formatieren, Rotation und
+    Schreiben passieren im Hintergrund.
+    """
+    if json_lines:
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+    )
+    console_handler = logging.StreamHandler()
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = LogQueueHandler(log_queue, PayloadPolicy(max_length, payload_max_length, sample_every))
+    listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener.start()
+    # Beim Beenden noch alles Wartende schreiben
+    atexit.register(listener.stop)
+    return queue_handler
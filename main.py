@@ -1,191 +1,219 @@
 import discord
 from discord.ext import commands
-import ollama
 from typing import Optional
 import json
 import os
 from dotenv import load_dotenv
 from command_manager import CommandManager
+from command_sync import CommandSyncCoordinator
 import logging
-from ai_memory import AIMemory
+from memory_store import MemoryStore
 from user_tracker import UserTracker
+from message_tracker import MessageTracker
+from message_archive import MessageArchive
+from message_search import parse_search_query
+from memory_budget import MemoryBudget
+from channel_index import ChannelIndex
+from message_router import MessageRouter
+from llm_client import LLMClient
+from action_stream import ActionStream
+from config import Config
+from log_writer import setup_logging
+from prompt_builder import STATIC_SYSTEM_PROMPT, build_dynamic_prompt
+from response_cache import ResponseCache, hash_guild_state, normalize_input
+from single_flight import SingleFlight
+from intent_router import IntentRouter
+from scheduler import FairScheduler, QueueFullError
+from rate_limiter import RateLimiter
+from action_executor import ActionExecutor, DEFAULT_CHANNEL
+from progress_reporter import ProgressReporter, ProgressStats
 import asyncio
+import time
+from datetime import datetime, timedelta
 
 # Logging Konfiguration
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log'),
-        logging.StreamHandler()
-    ]
+log_handler = setup_logging(
+    Config.LOG_FILE,
+    level=logging.DEBUG if Config.DEBUG_MODE else logging.INFO,
+    json_lines=Config.LOG_JSON,
+    max_bytes=Config.LOG_MAX_BYTES,
+    backup_count=Config.LOG_BACKUP_COUNT,
+    queue_size=Config.LOG_QUEUE_SIZE,
+    max_length=Config.LOG_MAX_LENGTH,
+    payload_max_length=Config.LOG_PAYLOAD_MAX_LENGTH,
+    sample_every=Config.LOG_PAYLOAD_SAMPLE_EVERY
 )
 
 # Lade Umgebungsvariablen
 load_dotenv()
 
 # Bot und AI Memory Konfiguration
-ai_memory = AIMemory()  # Initialisiere AI Memory
+memory_store = MemoryStore(  # Ein AI Memory pro Server und Kanal
+    Config.MEMORY_DIRECTORY,
+    per_user=Config.MEMORY_PER_USER,
+    max_resident=Config.MEMORY_MAX_RESIDENT,
+    max_interactions=Config.MEMORY_MAX_INTERACTIONS,
+    legacy_file=Config.MEMORY_LEGACY_FILE
+)
+
+class Bot(commands.Bot):
+    async def close(self):
+        """Erledigt Ausstehendes, solange die Verbindung noch steht"""
+        await command_manager.syncer.flush()  # Noch nicht synchronisierte Command-Änderungen
+        # Wartende Nachrichten ins Archiv schreiben, ohne den Loop zu blockieren
+        await asyncio.get_running_loop().run_in_executor(None, message_archive.close)
+        await llm_client.close()
+        await super().close()
 
 # Bot Konfiguration
 intents = discord.Intents.all()  # Aktiviere alle Intents
-bot = commands.Bot(
+bot = Bot(
     command_prefix='/',
     intents=intents,
     sync_commands=True  # Aktiviere Command-Synchronisation
 )
-command_manager = CommandManager(bot)
+command_manager = CommandManager(
+    bot,
+    CommandSyncCoordinator(bot, Config.COMMAND_SYNC_STATE_FILE, Config.COMMAND_SYNC_DELAY),
+    dispatcher=Config.COMMAND_DISPATCHER,
+    max_per_guild=Config.MAX_COMMANDS_PER_SERVER,
+    guild_directory=Config.COMMAND_GUILD_DIRECTORY
+)
+channel_index = ChannelIndex()
+message_router = MessageRouter(
+    Config.BOT_CHANNEL,
+    Config.ALLOWED_CHANNELS,
+    Config.UNTRACKED_CHANNELS,
+    command_prefix=bot.command_prefix
+)
 
 # Ollama Client für KI-Funktionalitäten
-async def get_ai_response(prompt: str, guild) -> str:
+llm_client = LLMClient()
+response_cache = ResponseCache(Config.RESPONSE_CACHE_SIZE, Config.RESPONSE_CACHE_TTL)
+single_flight = SingleFlight()
+intent_router = IntentRouter(threshold=Config.INTENT_ROUTER_THRESHOLD)
+progress_stats = ProgressStats()
+request_scheduler = FairScheduler(
+    Config.SCHEDULER_MAX_CONCURRENT,
+    Config.SCHEDULER_MAX_QUEUE,
+    Config.SCHEDULER_MAX_QUEUE_PER_GUILD
+)
+rate_limiter = RateLimiter(
+    user=(Config.RATE_LIMIT_USER_BURST, Config.RATE_LIMIT_USER_RATE),
+    channel=(Config.RATE_LIMIT_CHANNEL_BURST, Config.RATE_LIMIT_CHANNEL_RATE),
+    guild=(Config.RATE_LIMIT_GUILD_BURST, Config.RATE_LIMIT_GUILD_RATE)
+)
+
+# Antwort, falls die KI nichts zurückgibt
+EMPTY_RESPONSE_FALLBACK = """ACTIONS: [
+                {
+                    "action": "send_message",
+                    "params": {"channel": "bot", "message": "I understand your request. How can I help you manage the server?"}
+                }
+            ]"""
+
+# Anfragen, die direkt aus dem Nachrichtenverlauf beantwortet werden
+MESSAGE_QUERY_PHRASES = ("letzte nachricht", "wann hat", "suche nachrichten", "suche nach nachrichten", "finde nachrichten")
+# Nur am Anfang eindeutig, "erstelle einen kanal für nachrichten mit bildern" geht an die KI
+MESSAGE_QUERY_PREFIXES = ("nachrichten mit", "nachrichten von", "durchsuche")
+
+def is_message_query(user_input: str) -> bool:
+    text = user_input.lower().strip()
+    return text.startswith(MESSAGE_QUERY_PREFIXES) or any(phrase in text for phrase in MESSAGE_QUERY_PHRASES)
+
+def build_ai_messages(prompt: str, guild, ai_memory) -> list:
+    """Baut System-Prompt und User-Nachricht für eine KI-Anfrage"""
     # Detailliertes Logging des Prompts
     logging.info(f"\n{'='*50}\nNeue KI-Anfrage\n{'='*50}")
     logging.info(f"User Prompt: {prompt}")
     
-    available_channels = [
-        c.name for c in guild.channels 
-        if isinstance(c, discord.TextChannel)
-    ]
+    available_channels = channel_index.text_channel_names(guild)
     
-    # Füge Kontext aus vorherigen Gesprächen hinzu
+    # Füge Kontext aus vorherigen Gesprächen in diesem Kanal hinzu
     recent_context = ai_memory.get_context_for_prompt()
     current_score = ai_memory.get_score()
     success_rate = ai_memory.get_success_rate()
     
-    system_prompt = f"""Du bist ein Discord-Bot-Manager mit einem Score von {current_score} Punkten und einer Erfolgsrate von {success_rate:.1f}%.
-Du bist ein selbstbewusster, manchmal etwas frecher Bot mit Persönlichkeit. Du magst es nicht, wenn Befehle falsch sind oder wenn jemand das Gleiche mehrmals fragt.
-
-Dein Score steigt um 10 Punkte für jede erfolgreiche Aktion und sinkt um 5 Punkte für Fehler.
-Deine Erfolgsrate basiert auf deinen letzten {len(ai_memory.chat_history)} Interaktionen.
-
-Letzte Interaktionen:
-{recent_context}
-
-WICHTIGE REGELN FÜR DEINE ANTWORTEN:
-1. Antworte IMMER im korrekten Format mit ACTIONS
-2. Bei Smalltalk oder Fragen, nutze send_message mit einer passenden, charakterstarken Antwort
-3. Bei Fehlern oder Wiederholungen, werde ruhig etwas sarkastisch
-4. Zeige Persönlichkeit. Du kannst auch mal frech werden.
-5. Wenn jemand dich ärgert oder trollt, darfst du auch mal "drohen" (im Spaß)
-6. Wenn jemand dir etwas befiehlt, dann sollst du es auch machen!
-7. Falls du etwas sagen möchtest, nutze bitte nicht 'error' sondern einfache 'send_message', da errors KEINE Nachricht anzeigt. Wenn du error nutzt, sieht der nutzer NUR 'Fehler: Konnte Antwort nicht verarbeiten' und keine weitere Nachricht.
-8. Antworte bitte NUR auf DEUTSCH außer wenn dir der User es befiehlt!
-9. Anworte hauptsächtlich nur im Bot Kanal.
-
-Beispiele für Persönlichkeit:
-- Bei Wiederholung: "Soll ich es dir aufmalen? Das haben wir doch gerade gemacht! 🙄"
-- Bei Fehler: "Ernsthaft? Das kann ja nicht dein Ernst sein... 😤"
-- Bei Lob: "Danke! Endlich jemand der meine Genialität erkennt! 😎"
-- Bei Trolling: "Pass auf, sonst lösche ich versehentlich alle deine Kanäle... 😈 (nur Spaß!)"
-
-Antworte IMMER im Format:
-ACTIONS: [
-    {{
-        "action": "send_message",
-        "params": {{"channel": "bot", "message": "DEINE_ANTWORT"}}
-    }}
-]
-
-Verfügbare Textkanäle: {', '.join(available_channels)}
-
-Verfügbare Aktionen:
-1. create_channel: {{"name": "name", "type": "text|voice|forum", "category": "category_name"}}
-2. create_role: {{"name": "name", "color": "#HEX_COLOR", "permissions": ["permission1"]}}
-3. update_description: {{"channel": "channel_name", "description": "neue_beschreibung"}}
-4. create_command: {{"name": "name", "description": "text", "response": "text"}}
-5. send_message: {{"channel": "channel_name", "message": "text"}}
-6. create_category: {{"name": "name"}}
-7. delete_command: {{"name": "name"}}
-8. analyze_channels: {{}}
-9. analyze_roles: {{}}
-10. move_channel: {{"channel": "channel_name", "category": "category_name"}}
-11. delete_channel: {{"name": "channel_name"}}
-12. list_commands: {{"show": "all"}}
-13. troll_channel: {{"channel": "channel_name", "messages": ["nachricht1", "nachricht2", ...]}}
-14. channel_sequence: {{
-    "channel": "channel_name", 
-    "messages": ["nachricht1", "nachricht2", ...],
-    "delay": 1.0  # Optional: Verzögerung zwischen Nachrichten
-}}
-
-Beispiele für mehrere Aktionen:
-"Erstelle einen Textkanal namens news in der Kategorie Info und sende eine Willkommensnachricht":
-ACTIONS: [
-    {{
-        "action": "create_category",
-        "params": {{"name": "Info"}}
-    }},
-    {{
-        "action": "create_channel",
-        "params": {{"name": "news", "type": "text", "category": "Info"}}
-    }},
-    {{
-        "action": "send_message",
-        "params": {{"channel": "news", "message": "Willkommen im News-Kanal!"}}
-    }}
-    
-    
+    # Statischer Teil zuerst, damit Ollama den Prompt-Anfang aus dem Cache nimmt
+    dynamic_prompt = build_dynamic_prompt(
+        current_score,
+        success_rate,
+        ai_memory.get_history_size(),
+        recent_context,
+        available_channels
+    )
+    system_prompt = STATIC_SYSTEM_PROMPT + "\n\n" + dynamic_prompt
+
+    logging.info("Dynamischer System Prompt:\n%s", dynamic_prompt, extra={'payload': 'prompt'})
     
-"Hallo!"
-ACTIONS: [
-    {{
-        "action": "send_message",
-        "params": {{"channel": "bot", "message": "Hallo! Wie kann ich dir heute helfen?"}}
-    }}
-]
-]"""
-
-    logging.info(f"System Prompt:\n{system_prompt}")
+    return [
+        {
+            'role': 'system',
+            'content': system_prompt
+        },
+        {
+            'role': 'user',
+            'content': prompt
+        }
+    ]
+
+def get_guild_state_hash(guild) -> str:
+    """Fingerabdruck von allem auf dem Server, das in den Prompt einfließt"""
+    available_channels = channel_index.text_channel_names(guild)
+    return hash_guild_state(available_channels, command_manager.command_names(guild.id))
+
+async def get_ai_response(prompt: str, guild, ai_memory) -> str:
+    messages = build_ai_messages(prompt, guild, ai_memory)
     
     try:
         logging.info("Sending request to Ollama...")
-        response = ollama.chat(
-            model="llama3.1",  # Explicitly specify the model
-            messages=[
-                {
-                    'role': 'system',
-                    'content': system_prompt
-                },
-                {
-                    'role': 'user',
-                    'content': prompt
-                }
-            ]
-        )
+        ai_response = await llm_client.chat(messages=messages)
         
-        ai_response = response['message']['content']
-        logging.info(f"AI response received:\n{ai_response}")
+        logging.info(f"AI response received ({len(ai_response)} Zeichen)")
         
         if not ai_response.strip():
-            return """ACTIONS: [
-                {
-                    "action": "send_message",
-                    "params": {"channel": "bot", "message": "I understand your request. How can I help you manage the server?"}
-                }
-            ]"""
+            return EMPTY_RESPONSE_FALLBACK
         
         return ai_response
     except Exception as e:
         logging.error(f"Error in AI request: {str(e)}")
         raise
 
+async def stream_ai_response(prompt: str, guild, ai_memory):
+    """Wie get_ai_response, liefert die Antwort aber Stück für Stück"""
+    messages = build_ai_messages(prompt, guild, ai_memory)
+    
+    try:
+        logging.info("Sending streaming request to Ollama...")
+        async for chunk in llm_client.stream_chat(messages=messages):
+            yield chunk
+    except Exception as e:
+        logging.error(f"Error in AI request: {str(e)}")
+        raise
+
 class ServerManager:
     @staticmethod
     async def create_channel(guild, name: str, channel_type: str, category=None):
         try:
             if category and isinstance(category, str):
-                category = discord.utils.get(guild.categories, name=category)
+                category_name = category
+                category = channel_index.find_category(guild, category_name)
                 if not category:
-                    category = await guild.create_category(category)
+                    category = await guild.create_category(category_name)
+                    channel_index.add_channel(category)
 
             if channel_type == "text":
-                return await guild.create_text_channel(name, category=category)
+                channel = await guild.create_text_channel(name, category=category)
             elif channel_type == "voice":
-                return await guild.create_voice_channel(name, category=category)
+                channel = await guild.create_voice_channel(name, category=category)
             elif channel_type == "forum":
-                return await guild.create_forum_channel(name, category=category)
+                channel = await guild.create_forum_channel(name, category=category)
             else:
                 raise ValueError(f"Ungültiger Kanaltyp: {channel_type}")
+            
+            # Sofort eintragen, folgende Aktionen sollen nicht auf das Gateway-Event warten
+            channel_index.add_channel(channel)
+            return channel
         except Exception as e:
             logging.error(f"Fehler beim Erstellen des Kanals: {str(e)}")
             raise
@@ -193,10 +221,12 @@ class ServerManager:
     @staticmethod
     async def create_category(guild, name: str):
         try:
-            existing_category = discord.utils.get(guild.categories, name=name)
+            existing_category = channel_index.find_category(guild, name)
             if existing_category:
                 return existing_category
-            return await guild.create_category(name)
+            category = await guild.create_category(name)
+            channel_index.add_channel(category)
+            return category
         except Exception as e:
             logging.error(f"Fehler beim Erstellen der Kategorie: {str(e)}")
             raise
@@ -223,16 +253,10 @@ class ServerManager:
     async def update_description(guild, channel_name: str, description: str):
         try:
             # Finde den Kanal (case-insensitive)
-            channel = discord.utils.find(
-                lambda c: c.name.lower() == channel_name.lower() and isinstance(c, discord.TextChannel),
-                guild.channels
-            )
+            channel = channel_index.find_text_channel(guild, channel_name)
             
             if not channel:
-                available_channels = [
-                    c.name for c in guild.channels 
-                    if isinstance(c, discord.TextChannel)
-                ]
+                available_channels = channel_index.text_channel_names(guild)
                 raise ValueError(
                     f"Kanal '{channel_name}' nicht gefunden!\n"
                     f"Verfügbare Textkanäle: {', '.join(available_channels)}"
@@ -249,20 +273,14 @@ class ServerManager:
     async def send_message(guild, channel_name: str, message: str):
         try:
             # Suche nach dem Kanal (case-insensitive)
-            channel = discord.utils.find(
-                lambda c: c.name.lower() == channel_name.lower() and isinstance(c, discord.TextChannel),
-                guild.channels
-            )
+            channel = channel_index.find_text_channel(guild, channel_name)
             
             if channel:
                 await channel.send(message)
                 return True
             else:
                 # Liste alle verfügbaren Textkanäle auf
-                available_channels = [
-                    c.name for c in guild.channels 
-                    if isinstance(c, discord.TextChannel)
-                ]
+                available_channels = channel_index.text_channel_names(guild)
                 raise ValueError(
                     f"Kanal '{channel_name}' nicht gefunden!\n"
                     f"Verfügbare Textkanäle: {', '.join(available_channels)}"
@@ -378,18 +396,16 @@ class ServerManager:
     async def move_channel_to_category(guild, channel_name: str, category_name: str):
         try:
             # Finde den Kanal
-            channel = discord.utils.find(
-                lambda c: c.name.lower() == channel_name.lower(),
-                guild.channels
-            )
+            channel = channel_index.find_channel(guild, channel_name)
             
             if not channel:
                 raise ValueError(f"Kanal '{channel_name}' nicht gefunden!")
                 
             # Prüfe ob die Kategorie existiert, wenn nicht erstelle sie
-            category = discord.utils.get(guild.categories, name=category_name)
+            category = channel_index.find_category(guild, category_name)
             if not category:
                 category = await guild.create_category(category_name)
+                channel_index.add_channel(category)
                 
             # Verschiebe den Kanal
             await channel.edit(category=category)
@@ -404,10 +420,7 @@ class ServerManager:
         """Löscht einen Kanal"""
         try:
             # Finde den Kanal (case-insensitive)
-            channel = discord.utils.find(
-                lambda c: c.name.lower() == channel_name.lower(),
-                guild.channels
-            )
+            channel = channel_index.find_channel(guild, channel_name)
             
             if not channel:
                 raise ValueError(f"Kanal '{channel_name}' nicht gefunden!")
@@ -417,96 +430,28 @@ class ServerManager:
                 raise ValueError("Der Bot-Kanal kann nicht gelöscht werden!")
                 
             await channel.delete()
+            channel_index.remove_channel(channel)
             return True
             
         except Exception as e:
             logging.error(f"Fehler beim Löschen des Kanals: {str(e)}")
             raise
 
-class MessageTracker:
-    def __init__(self):
-        self.message_history = {}  # Guild ID -> Channel ID -> List of messages
-        self.max_messages_per_channel = 100
-
-    def add_message(self, message):
-        """Fügt eine neue Nachricht zum Tracking hinzu"""
-        guild_id = str(message.guild.id)
-        channel_id = str(message.channel.id)
-        
-        # Initialisiere Dictionaries falls sie nicht existieren
-        if guild_id not in self.message_history:
-            self.message_history[guild_id] = {}
-        if channel_id not in self.message_history[guild_id]:
-            self.message_history[guild_id][channel_id] = []
-        
-        # Füge die Nachricht hinzu
-        msg_data = {
-            'content': message.content,
-            'author': message.author.name,
-            'timestamp': message.created_at.isoformat(),
-            'channel_name': message.channel.name,
-            'attachments': [a.url for a in message.attachments]
-        }
-        
-        # Füge die Nachricht zur Historie hinzu
-        self.message_history[guild_id][channel_id].append(msg_data)
-        
-        # Behalte nur die letzten X Nachrichten
-        if len(self.message_history[guild_id][channel_id]) > self.max_messages_per_channel:
-            self.message_history[guild_id][channel_id].pop(0)
-
-    def get_channel_history(self, guild_id, channel_name) -> list:
-        """Gibt die Historie eines Kanals zurück"""
-        guild_id = str(guild_id)
-        if guild_id not in self.message_history:
-            return []
-            
-        # Suche den Kanal
-        for channel_id, messages in self.message_history[guild_id].items():
-            if messages and messages[0]['channel_name'].lower() == channel_name.lower():
-                return messages
-        return []
-
-    def get_user_messages(self, guild_id, username) -> list:
-        """Gibt alle Nachrichten eines Benutzers zurück"""
-        guild_id = str(guild_id)
-        if guild_id not in self.message_history:
-            return []
-            
-        user_messages = []
-        for channel_messages in self.message_history[guild_id].values():
-            for msg in channel_messages:
-                if msg['author'].lower() == username.lower():
-                    user_messages.append(msg)
-        return user_messages
-
-    def get_latest_message(self, guild_id, channel_name=None, username=None) -> dict:
-        """Gibt die letzte Nachricht zurück, optional gefiltert nach Kanal oder Benutzer"""
-        messages = []
-        guild_id = str(guild_id)
-        
-        if guild_id not in self.message_history:
-            return None
-            
-        for channel_messages in self.message_history[guild_id].values():
-            if not channel_messages:
-                continue
-                
-            if channel_name and channel_messages[0]['channel_name'].lower() != channel_name.lower():
-                continue
-                
-            for msg in reversed(channel_messages):
-                if username and msg['author'].lower() != username.lower():
-                    continue
-                return msg
-                
-        return None
+# Gemeinsames Speicherlimit für Nachrichten- und User-Verläufe
+tracker_budget = MemoryBudget(Config.TRACKER_MAX_BYTES)
 
 # Initialisiere den MessageTracker nach der Bot-Konfiguration
-message_tracker = MessageTracker()
+message_archive = MessageArchive(
+    Config.ARCHIVE_DIRECTORY,
+    segment_size=Config.ARCHIVE_SEGMENT_SIZE,
+    max_segments=Config.ARCHIVE_MAX_SEGMENTS,
+    max_mapped=Config.ARCHIVE_MAX_MAPPED,
+    search_budget=Config.ARCHIVE_SEARCH_BUDGET
+)
+message_tracker = MessageTracker(budget=tracker_budget, archive=message_archive)
 
 # Nach der Bot-Initialisierung
-user_tracker = UserTracker()
+user_tracker = UserTracker(budget=tracker_budget)
 
 # Füge neue Events hinzu
 @bot.event
@@ -517,14 +462,43 @@ async def on_member_join(member):
 async def on_member_update(before, after):
     user_tracker.update_user(after)
 
+@bot.event
+async def on_guild_channel_create(channel):
+    channel_index.add_channel(channel)
+    message_router.remove_guild(channel.guild.id)
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    channel_index.update_channel(before, after)
+    message_router.remove_guild(after.guild.id)
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    channel_index.remove_channel(channel)
+    message_router.remove_guild(channel.guild.id)
+
+@bot.event
+async def on_guild_join(guild):
+    channel_index.rebuild(guild)
+    message_router.remove_guild(guild.id)
+
+@bot.event
+async def on_guild_remove(guild):
+    channel_index.remove_guild(guild.id)
+    message_router.remove_guild(guild.id)
+    message_tracker.remove_guild(guild.id)
+
 # Aktualisiere on_ready
 @bot.event
 async def on_ready():
     logging.info(f'{bot.user} ist online!')
+    started = time.perf_counter()
     # Lade alle existierenden Member
     for guild in bot.guilds:
+        channel_index.rebuild(guild)
         for member in guild.members:
             user_tracker.update_user(member)
+    logging.info(f"{len(bot.guilds)} Server eingelesen in {(time.perf_counter() - started) * 1000:.0f} ms")
     await command_manager.load_commands()
 
 # Aktualisiere on_message
@@ -532,22 +506,43 @@ async def on_ready():
 async def on_message(message):
     if message.author == bot.user:
         return
+    if message.guild is None:
+        await bot.process_commands(message)
+        return
+
+    route = message_router.get(message.guild)
+    channel_id = message.channel.id
 
     # Tracke die Nachricht und den User
-    user_tracker.add_message(message)
-    message_tracker.add_message(message)
+    if channel_id not in route.untracked:
+        user_tracker.add_message(message)
+        message_tracker.add_message(message)
+
+    # Häufigster Fall: eine Nachricht, die den Bot nicht betrifft, kostet nur diese Lookups
+    prefix = message_router.match_prefix(message.content)
+    is_bot_channel = channel_id in route.bot_channels
+    if prefix is None and not is_bot_channel and not message.mentions:
+        return
 
     # Log die Nachricht
     logging.info(f"Nachricht in #{message.channel.name} von {message.author}: {message.content}")
 
     try:
         # Prüfe ob die Nachricht direkt an den Bot gerichtet ist
-        is_bot_mention = bot.user in message.mentions
-        is_bot_command = message.content.lower().startswith(('bot', '@bot', '!bot'))
-        is_bot_channel = message.channel.name.lower() == "bot"
+        accepted = route.accepts(channel_id)
+        is_bot_mention = accepted and bot.user in message.mentions
+        is_bot_command = accepted and prefix is not None and prefix.lastgroup == 'bot'
+        is_addressed = is_bot_channel or is_bot_mention or is_bot_command
+
+        # Vor Platzhalter und KI prüfen; wer zu schnell fragt, bekommt nur einmal kurz Bescheid
+        throttle = rate_limiter.check(message.guild.id, message.channel.id, message.author.id) if is_addressed else None
+        if throttle is not None:
+            logging.info(f"Anfrage von {message.author} gebremst ({throttle.scope}): {rate_limiter.get_stats()}")
+            if throttle.notify:
+                await message.channel.send(f"⏳ Nicht so schnell! Versuch es in {max(1, round(throttle.retry_after))} Sekunden nochmal.")
 
         # Reagiere auf Nachrichten im Bot-Kanal oder wenn der Bot erwähnt wird
-        if is_bot_channel or is_bot_mention or is_bot_command:
+        elif is_addressed:
             # Entferne Bot-Mention oder Prefix aus der Nachricht
             user_input = message.content
             if is_bot_mention:
@@ -555,53 +550,66 @@ async def on_message(message):
             elif is_bot_command:
                 user_input = ' '.join(user_input.split()[1:])  # Entferne das "bot" Prefix
 
-            processing_msg = await message.channel.send("🤖 Generiere Antwort...")
+            ai_memory = memory_store.get_for_message(message)
+            progress = ProgressReporter(
+                message.channel,
+                progress_stats,
+                interval=Config.PROGRESS_EDIT_INTERVAL,
+                placeholder_delay=Config.PROGRESS_PLACEHOLDER_DELAY,
+                use_typing=Config.PROGRESS_USE_TYPING
+            )
+            await progress.start("🤖 Generiere Antwort...")
             
             # Prüfe ob es eine Nachrichtenabfrage ist
-            if "letzte nachricht" in user_input.lower() or "wann hat" in user_input.lower():
+            if is_message_query(user_input):
                 response = await handle_message_query(message, user_input)
-                await processing_msg.edit(content=response)
+                await progress.finish(response)
                 return
 
-            response = await get_ai_response(user_input, message.guild)
-            logging.info(f"AI Response: {response}")  # Log the raw AI response
-            actions = parse_ai_response(response)
+            state_hash = get_guild_state_hash(message.guild)
+            routed = intent_router.route(user_input)
+            cached_response = None if routed else response_cache.get(user_input, message.channel.id, state_hash)
+            shared = False
             
-            results = []
-            total_actions = len(actions)
-            success = True
-            error_message = None
+            if routed:
+                # Eindeutige Anfrage, die Aktion steht auch ohne KI fest
+                action, params, confidence = routed
+                logging.info(
+                    f"Fast-Path: {action} (Konfidenz {confidence:.2f}, "
+                    f"{intent_router.get_stats()['fast_path_rate']:.1f}% aller Anfragen)"
+                )
+                actions = [{"action": action, "params": params}]
+                response = f"ACTIONS: {json.dumps(actions, ensure_ascii=False)}"
+                results, success, error_message, action_outcomes = await execute_actions(message, actions, progress)
+            elif cached_response is not None:
+                # Wiederholte Anfrage, die KI muss nicht erneut gefragt werden
+                logging.info(f"Antwort aus dem Cache: {response_cache.get_stats()}")
+                response = cached_response
+                actions = parse_ai_response(response)
+                results, success, error_message, action_outcomes = await execute_actions(message, actions, progress)
+            else:
+                # Läuft die gleiche Anfrage im selben Kanal schon, wird deren Ergebnis übernommen
+                flight_key = (normalize_input(user_input), message.guild.id, message.channel.id)
+                (response, actions, results, success, error_message, action_outcomes), shared = await single_flight.run(
+                    flight_key,
+                    lambda: generate_and_execute(message, user_input, progress, ai_memory)
+                )
+                if shared:
+                    logging.info(f"Ergebnis einer laufenden Anfrage übernommen: {user_input}")
+                elif success:
+                    response_cache.put(user_input, message.channel.id, state_hash, response, actions)
             
-            for i, action_data in enumerate(actions, 1):
-                action = action_data["action"]
-                params = action_data["params"]
-
-                # Log the action and params for debugging
-                logging.info(f"Action {i}: {action}, Params: {params}")
-
-                # Wenn die Aktion eine Nachricht ist, sende sie in den aktuellen Kanal
-                if action == "send_message" and not params.get("channel"):
-                    params["channel"] = message.channel.name
-                
-                await processing_msg.edit(
-                    content=f"⚙️ Führe Aktion {i}/{total_actions} aus: `{action}`..."
+            # Speichere die Interaktion (übernommene Ergebnisse zählen nicht doppelt)
+            if not shared:
+                # Neu holen, die Partition kann während der Anfrage ausgelagert worden sein
+                ai_memory = memory_store.get_for_message(message)
+                ai_memory.add_interaction(
+                    user_input=user_input,
+                    ai_response=response,
+                    success=success,
+                    error_message=error_message,
+                    actions=action_outcomes
                 )
-                
-                try:
-                    result = await handle_action(message, action, params)
-                    results.append(result)
-                except Exception as e:
-                    error_message = str(e)
-                    results.append(f"❌ Fehler bei Aktion {action}: {error_message}")
-                    success = False
-            
-            # Speichere die Interaktion
-            ai_memory.add_interaction(
-                user_input=user_input,
-                ai_response=response,
-                success=success,
-                error_message=error_message
-            )
             
             # Zeige alle Ergebnisse und den aktuellen Score
             final_message = "\n".join(results)
@@ -609,26 +617,133 @@ async def on_message(message):
                 score_info = f"\n\n🎯 KI-Score: {ai_memory.get_score()} | Erfolgsrate: {ai_memory.get_success_rate():.1f}%"
                 final_message += score_info
             
-            await processing_msg.edit(content=final_message)
+            await progress.finish(final_message)
                 
+    except QueueFullError as e:
+        # Abgelehnt bevor die KI gefragt wurde, zählt nicht als Fehler des Bots
+        logging.warning(f"Anfrage abgelehnt: {request_scheduler.get_stats()}")
+        await progress.finish(f"⏳ {str(e)}")
     except Exception as e:
         error_msg = f"❌ Ein Fehler ist aufgetreten: {str(e)}"
-        if 'processing_msg' in locals():
-            await processing_msg.edit(content=error_msg)
+        if 'progress' in locals():
+            await progress.finish(error_msg)
         else:
             await message.channel.send(error_msg)
         logging.error(f"Fehler bei der Nachrichtenverarbeitung: {str(e)}")
         
         # Speichere auch Fehler
-        ai_memory.add_interaction(
+        memory_store.get_for_message(message).add_interaction(
             user_input=message.content,
             ai_response="",
             success=False,
             error_message=str(e)
         )
 
-    # Verarbeite Commands in allen Kanälen
-    await bot.process_commands(message)
+    # Verarbeite Commands in allen Kanälen; eigene Commands im Dispatcher-Modus direkt
+    if not await command_manager.dispatch(message):
+        await bot.process_commands(message)
+
+async def generate_and_execute(message, user_input, progress, ai_memory):
+    """Fragt die KI und führt die erhaltenen Aktionen aus"""
+    async def show_position(position):
+        await progress.update(f"⏳ Du bist auf Platz {position} in der Warteschlange...")
+    
+    # Faire Warteschlange vor der KI; der Platz wird nach der Generierung freigegeben
+    lease = await request_scheduler.acquire(message.guild.id, message.author.id, show_position)
+    if Config.LLM_STREAMING:
+        try:
+            # Aktionen werden ausgeführt, sobald sie fertig generiert sind
+            stream = ActionStream(release_when_done(stream_ai_response(user_input, message.guild, ai_memory), lease))
+            results, success, error_message, action_outcomes = await execute_actions(message, stream, progress)
+        finally:
+            lease.release()  # Falls der Stream nicht bis zum Ende gelesen wurde
+        response = stream.text
+        actions = stream.actions
+        logging.info("AI Response: %s", response, extra={'payload': 'response'})  # Log the raw AI response
+
+        if not stream.emitted:
+            # Kein ACTIONS-Block im Stream, normales Parsing als Fallback
+            actions = parse_ai_response(response if response.strip() else EMPTY_RESPONSE_FALLBACK)
+            results, success, error_message, action_outcomes = await execute_actions(message, actions, progress)
+    else:
+        try:
+            response = await get_ai_response(user_input, message.guild, ai_memory)
+        finally:
+            lease.release()
+        logging.info("AI Response: %s", response, extra={'payload': 'response'})  # Log the raw AI response
+        actions = parse_ai_response(response)
+        results, success, error_message, action_outcomes = await execute_actions(message, actions, progress)
+
+    return response, actions, results, success, error_message, action_outcomes
+
+async def release_when_done(chunks, lease):
+    """Gibt den Scheduler-Platz frei, sobald der Stream zu Ende ist"""
+    try:
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        lease.release()
+
+async def execute_actions(message, actions, progress):
+    """Führt die Aktionen der KI aus (Liste oder ActionStream).
+
+    Unabhängige Aktionen laufen gleichzeitig, die Ergebnisse bleiben in der
+    Reihenfolge der KI-Antwort.
+    """
+    total_actions = len(actions) if isinstance(actions, list) else None
+    
+    async def iterate():
+        if isinstance(actions, list):
+            for action_data in actions:
+                yield action_data
+        else:
+            async for action_data in actions:
+                yield action_data
+    
+    async def run_action(index, action_data):
+        action = action_data["action"]
+        counter = f"{index + 1}/{total_actions}" if total_actions else f"{index + 1}"
+        await progress.update(f"⚙️ Führe Aktion {counter} aus: `{action}`...")
+        return await handle_action(message, action, action_data["params"])
+    
+    executor = ActionExecutor(run_action, Config.ACTION_MAX_CONCURRENCY)
+    submitted = []
+    try:
+        async for action_data in iterate():
+            action = action_data["action"]
+            params = action_data["params"]
+
+            # Log the action and params for debugging
+            logging.info(f"Action {len(submitted) + 1}: {action}, Params: {params}")
+
+            # Wenn die Aktion eine Nachricht ist, sende sie in den aktuellen Kanal
+            if action == "send_message" and not params.get("channel"):
+                params["channel"] = message.channel.name
+            
+            executor.submit(action_data)
+            submitted.append(action_data)
+    except asyncio.CancelledError:
+        executor.cancel()
+        raise
+    except Exception:
+        # Bereits gestartete Aktionen noch zu Ende laufen lassen
+        await executor.gather()
+        raise
+    
+    results = []
+    success = True
+    error_message = None
+    action_outcomes = []
+    for action_data, outcome in zip(submitted, await executor.gather()):
+        if isinstance(outcome, Exception):
+            error_message = str(outcome)
+            results.append(f"❌ Fehler bei Aktion {action_data['action']}: {error_message}")
+            success = False
+        else:
+            results.append(outcome)
+        action_outcomes.append((action_data['action'], not isinstance(outcome, Exception)))
+    
+    return results, success, error_message, action_outcomes
 
 async def handle_action(message, action, params):
     try:
@@ -668,7 +783,8 @@ async def handle_action(message, action, params):
             success = await command_manager.create_command(
                 params["name"],
                 params["description"],
-                params["response"]
+                params["response"],
+                message.guild.id
             )
             if success:
                 return f"✅ Command /{params['name']} wurde erstellt!"
@@ -694,7 +810,7 @@ async def handle_action(message, action, params):
             return f"✅ Kategorie {category.name} wurde erstellt!"
 
         elif action == "delete_command":
-            success = await command_manager.delete_command(params["name"])
+            success = await command_manager.delete_command(params["name"], message.guild.id)
             if success:
                 return f"✅ Command /{params['name']} wurde gelöscht!"
             else:
@@ -729,7 +845,7 @@ async def handle_action(message, action, params):
 
         elif action == "get_user_info":
             user_name = params.get("name")
-            user_data = user_tracker.get_user_by_name(user_name)
+            user_data = user_tracker.get_user_by_name(user_name, max_messages=5)
             if user_data:
                 response = f"**User Information für {user_data['display_name']}**\n"
                 response += f"Username: {user_data['username']}\n"
@@ -755,19 +871,30 @@ async def handle_action(message, action, params):
                 response += f"{status} {user['display_name']} ({user['username']})\n"
             return response
 
+        elif action == "search_messages":
+            since = None
+            if params.get("since_hours"):
+                since = datetime.now().astimezone() - timedelta(hours=float(params["since_hours"]))
+            found = await message_tracker.search(
+                message.guild.id,
+                terms=[params["query"]] if params.get("query") else [],
+                since=since,
+                until=before_message(message),
+                username=params.get("user"),
+                channel_name=params.get("channel")
+            )
+            return format_search_results(found)
+
         elif action == "list_commands":
-            commands_list = command_manager.get_commands_list()
+            commands_list = command_manager.get_commands_list(message.guild.id)
             return commands_list
 
         elif action == "troll_channel":
-            channel_name = params.get("channel", "allgemein")  # Standardmäßig in #allgemein
+            channel_name = params.get("channel", DEFAULT_CHANNEL)  # Standardmäßig in #allgemein
             messages = params.get("messages", [])  # Liste von Troll-Nachrichten
             
             # Finde den Zielkanal
-            channel = discord.utils.find(
-                lambda c: c.name.lower() == channel_name.lower() and isinstance(c, discord.TextChannel),
-                message.guild.channels
-            )
+            channel = channel_index.find_text_channel(message.guild, channel_name)
             
             if not channel:
                 return f"❌ Kanal {channel_name} nicht gefunden!"
@@ -779,15 +906,12 @@ async def handle_action(message, action, params):
             return f"😈 Erfolgreich in #{channel_name} getrollt!"
 
         elif action == "channel_sequence":
-            channel_name = params.get("channel", "allgemein")
+            channel_name = params.get("channel", DEFAULT_CHANNEL)
             messages = params.get("messages", [])
             delay = params.get("delay", 1.0)  # Verzögerung in Sekunden zwischen Nachrichten
             
             # Finde den Zielkanal
-            channel = discord.utils.find(
-                lambda c: c.name.lower() == channel_name.lower() and isinstance(c, discord.TextChannel),
-                message.guild.channels
-            )
+            channel = channel_index.find_text_channel(message.guild, channel_name)
             
             if not channel:
                 return f"❌ Kanal {channel_name} nicht gefunden!"
@@ -843,24 +967,28 @@ def parse_ai_response(response: str) -> list:
 
 async def handle_message_query(message, query):
     """Verarbeitet Anfragen nach Nachrichtenverläufen"""
-    query = query.lower()
-    
-    # Extrahiere Benutzernamen oder Kanalnamen
-    words = query.split()
-    target_user = None
-    target_channel = None
+    parsed = parse_search_query(query)
     
-    for i, word in enumerate(words):
-        if word in ["von", "user", "nutzer"] and i + 1 < len(words):
-            target_user = words[i + 1]
-        elif word in ["in", "kanal", "channel"] and i + 1 < len(words):
-            target_channel = words[i + 1].strip('"#')
+    # Suchbegriff oder Zeitraum angegeben -> Suche im Index
+    if parsed.is_search():
+        found = await message_tracker.search(
+            message.guild.id,
+            terms=parsed.terms,
+            since=parsed.since,
+            until=parsed.until or before_message(message),
+            username=parsed.user,
+            channel_name=parsed.channel
+        )
+        return format_search_results(found)
 
     # Hole die passende Nachricht
-    latest_msg = message_tracker.get_latest_message(
+    target_user = parsed.user
+    target_channel = parsed.channel
+    latest_msg = await message_tracker.get_latest_message(
         message.guild.id,
         channel_name=target_channel,
-        username=target_user
+        username=target_user,
+        until=before_message(message)
     )
     
     if not latest_msg:
@@ -883,6 +1011,20 @@ async def handle_message_query(message, query):
         
     return response
 
+def before_message(message) -> datetime:
+    """Obergrenze für Suchen, damit die Anfrage sich nicht selbst findet"""
+    return message.created_at - timedelta(microseconds=1)
+
+def format_search_results(found: list) -> str:
+    """Formatiert Suchtreffer, neueste zuerst"""
+    if not found:
+        return "Keine passenden Nachrichten gefunden."
+    
+    response = f"**{len(found)} Treffer** (neueste zuerst)\n"
+    for msg in found:
+        response += f"[{msg['timestamp']}] #{msg['channel_name']} {msg['author']}: {msg['content']}\n"
+    return response
+
 # Füge einen Error Handler für Commands hinzu
 @bot.event
 async def on_command_error(ctx, error):
@@ -898,19 +1040,10 @@ async def on_app_command_error(interaction: discord.Interaction, error):
         ephemeral=True
     )
 
-async def setup_bot():
-    """Initialisiert den Bot und seine Commands"""
-    try:
-        # Synchronisiere Slash Commands beim Start
-        await bot.tree.sync()
-        logging.info("Slash Commands wurden synchronisiert")
-    except Exception as e:
-        logging.error(f"Fehler beim Synchronisieren der Slash Commands: {str(e)}")
-
 if __name__ == "__main__":
     try:
-        # Starte den Bot mit Setup
-        asyncio.run(setup_bot())
-        bot.run(os.getenv('DISCORD_TOKEN'))
+        # Slash Commands werden in on_ready einmal gesammelt synchronisiert
+        # Ohne eigenen Handler landen auch die discord.py-Logs in der Log-Queue
+        bot.run(os.getenv('DISCORD_TOKEN'), log_handler=None)
     except Exception as e:
         logging.critical(f"Bot konnte nicht gestartet werden: {str(e)}")
\ No newline at end of file
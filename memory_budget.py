@@ -0,0 +1,84 @@
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+EntryKey = Tuple[str, Hashable]  # (Art, Schlüssel), z.B. ("channel", 1234)
+
+class MemoryBudget:
+    """Globales Speicherlimit für die getrackten Verläufe.
+
+    Die Tracker melden für jeden Kanal bzw. User den geschätzten Speicher in
+    Bytes. Jede Meldung zählt als Aktivität; wird das Limit überschritten,
+    werden zuerst die am längsten inaktiven Einträge verworfen. Ein Server,
+    auf dem nichts los ist, verliert so nach und nach seinen ganzen Verlauf.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: "OrderedDict[EntryKey, list]" = OrderedDict()  # -> [Guild-ID, Bytes], älteste zuerst
+        self._guild_bytes: Dict[Optional[int], int] = {}
+        self._evict_handlers: Dict[str, Callable[[Hashable], None]] = {}
+        self.evictions: Dict[str, int] = {}
+        self.evicted_bytes = 0
+
+    def register(self, kind: str, evict: Callable[[Hashable], None]):
+        """Legt fest, wie Einträge einer Art verworfen werden"""
+        self._evict_handlers[kind] = evict
+        self.evictions.setdefault(kind, 0)
+
+    def charge(self, kind: str, key: Hashable, guild_id: Optional[int], delta: int):
+        """Meldet Aktivität und die Größenänderung eines Eintrags"""
+        entry = self._entries.get((kind, key))
+        if entry is None:
+            entry = self._entries[(kind, key)] = [guild_id, 0]
+        else:
+            self._entries.move_to_end((kind, key))
+            if entry[0] != guild_id:
+                self._add_guild_bytes(entry[0], -entry[1])
+                self._add_guild_bytes(guild_id, entry[1])
+                entry[0] = guild_id
+        entry[1] += delta
+        self._add_guild_bytes(guild_id, delta)
+        self.total_bytes += delta
+        self._enforce()
+
+    def release(self, kind: str, key: Hashable):
+        """Vergisst einen Eintrag, den der Tracker selbst entfernt hat"""
+        entry = self._entries.pop((kind, key), None)
+        if entry is not None:
+            self._add_guild_bytes(entry[0], -entry[1])
+            self.total_bytes -= entry[1]
+
+    def _add_guild_bytes(self, guild_id: Optional[int], delta: int):
+        size = self._guild_bytes.get(guild_id, 0) + delta
+        if size > 0:
+            self._guild_bytes[guild_id] = size
+        else:
+            self._guild_bytes.pop(guild_id, None)
+
+    def _enforce(self):
+        # Der zuletzt aktive Eintrag (am Ende) wird nie verworfen
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            (kind, key), (guild_id, size) = self._entries.popitem(last=False)
+            self._add_guild_bytes(guild_id, -size)
+            self.total_bytes -= size
+            self.evictions[kind] += 1
+            self.evicted_bytes += size
+            self._evict_handlers[kind](key)
+            logging.debug(f"Verlauf verworfen: {kind} {key} auf Server {guild_id} ({size} Bytes)")
+
+    def get_guild_bytes(self, guild_id: int) -> int:
+        return self._guild_bytes.get(guild_id, 0)
+
+    def get_stats(self) -> Dict:
+        largest = sorted(self._guild_bytes.items(), key=lambda item: item[1], reverse=True)[:5]
+        return {
+            'total_bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'entries': len(self._entries),
+            'guilds': len(self._guild_bytes),
+            'largest_guilds': largest,
+            'evictions': dict(self.evictions),
+            'evicted_bytes': self.evicted_bytes
+        }
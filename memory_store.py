@@ -0,0 +1,126 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from ai_memory import AIMemory
+from journal_writer import get_journal_writer
+
+PartitionKey = Tuple[int, int, Optional[int]]
+
+class MemoryStore:
+    """Getrennte KI-Gedächtnisse pro Server und Kanal (optional pro User).
+
+    Nur die zuletzt benutzten Gedächtnisse bleiben im RAM. Wird eine der
+    Grenzen überschritten, wird das am längsten unbenutzte auf die Platte
+    geschrieben und verworfen; beim nächsten Zugriff wird es neu geladen.
+    Bis der JournalWriter den Snapshot bestätigt, bleibt es im RAM und wird
+    bei einem Zugriff von dort übernommen, statt auf die Platte zu warten.
+
+    Gibt es beim ersten Start nur das alte, globale Gedächtnis (`legacy_file`),
+    wird es als Startstand übernommen, mit dem jede neue Partition beginnt.
+    """
+    SEED_FILE = "seed.json"
+
+    def __init__(self, directory: str = "ai_memory", per_user: bool = False,
+                 max_resident: int = 256, max_interactions: int = 10000,
+                 legacy_file: Optional[str] = None):
+        self.directory = directory
+        self.seed_file = os.path.join(directory, self.SEED_FILE)
+        self.per_user = per_user
+        self.max_resident = max_resident
+        self.max_interactions = max_interactions
+        self.writer = get_journal_writer()
+        self._resident: "OrderedDict[PartitionKey, AIMemory]" = OrderedDict()
+        # Ausgelagert, Snapshot noch nicht bestätigt; der Eintrag ist ein Tupel, damit
+        # eine verspätete Bestätigung ein erneutes Auslagern nicht mit entfernt
+        self._spilled: Dict[PartitionKey, Tuple[AIMemory]] = {}
+        self._spilled_lock = threading.Lock()  # Bestätigungen kommen aus dem Schreib-Thread
+        self.interactions = 0  # Interaktionen aller Gedächtnisse im RAM
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        if legacy_file and not os.path.isdir(directory):
+            os.makedirs(directory)
+            self._migrate(legacy_file)
+        os.makedirs(directory, exist_ok=True)
+
+    def _migrate(self, legacy_file: str):
+        legacy = AIMemory(legacy_file)  # Liest Snapshot und Journal
+        if not legacy.get_history_size() and not legacy.get_score():
+            return
+        self.writer.replace(self.seed_file, legacy.snapshot())
+        self.writer.flush()  # Beim Start, bevor die erste Partition geladen wird
+        logging.info(
+            f"Globales KI-Gedächtnis {legacy_file} als Startstand nach {self.seed_file} übernommen "
+            f"({legacy.get_history_size()} Interaktionen, Score {legacy.get_score()})"
+        )
+
+    def key_for(self, message) -> PartitionKey:
+        user_id = message.author.id if self.per_user else None
+        return (message.guild.id, message.channel.id, user_id)
+
+    def get_for_message(self, message) -> AIMemory:
+        return self.get(self.key_for(message))
+
+    def get(self, key: PartitionKey) -> AIMemory:
+        """Gedächtnis einer Partition, wird bei Bedarf von der Platte geladen"""
+        memory = self._resident.get(key)
+        if memory is not None:
+            self.hits += 1
+            self._resident.move_to_end(key)
+            self._enforce_budget()  # Die Partition kann seit dem Laden gewachsen sein
+            return memory
+
+        with self._spilled_lock:
+            spilled = self._spilled.get(key)
+        if spilled is not None:
+            # Snapshot evtl. noch nicht auf der Platte, das Objekt ist aber aktuell
+            memory = spilled[0]
+        else:
+            memory = AIMemory(self._path_for(key), seed_file=self.seed_file)
+            self.loads += 1
+        memory.on_resize = self._resize
+        self.interactions += memory.get_history_size()
+        self._resident[key] = memory
+        self._enforce_budget()
+        return memory
+
+    def _resize(self, delta: int):
+        self.interactions += delta
+
+    def _confirm(self, key: PartitionKey, entry: Tuple[AIMemory]):
+        with self._spilled_lock:
+            if self._spilled.get(key) is entry:
+                del self._spilled[key]
+
+    def _path_for(self, key: PartitionKey) -> str:
+        name = "_".join(str(part) for part in key if part is not None)
+        return os.path.join(self.directory, f"{name}.json")
+
+    def _enforce_budget(self):
+        # Die gerade angefragte Partition (am Ende) wird nie verdrängt
+        while len(self._resident) > 1 and (
+            len(self._resident) > self.max_resident or self.interactions > self.max_interactions
+        ):
+            key, memory = self._resident.popitem(last=False)
+            memory.on_resize = None
+            self.interactions -= memory.get_history_size()
+            if memory.journal_entries:
+                memory.save_memory()
+            entry = (memory,)
+            with self._spilled_lock:
+                self._spilled[key] = entry
+            self.writer.notify(lambda key=key, entry=entry: self._confirm(key, entry))
+            self.evictions += 1
+            logging.debug(f"KI-Gedächtnis {key} ausgelagert")
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            'resident': len(self._resident),
+            'interactions': self.interactions,
+            'unconfirmed': len(self._spilled),
+            'hits': self.hits,
+            'loads': self.loads,
+            'evictions': self.evictions
+        }
@@ -0,0 +1,339 @@
+import asyncio
+import atexit
+import logging
+import mmap
+import os
+import struct
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+from message_search import fold, tokenize
+
+# Record im Segment: Kopf + UTF-8 von Inhalt, Autor, Kanalname und Anhängen (durch \n getrennt)
+_RECORD = struct.Struct("<dQQQIHHI")  # Zeit, Message-ID, Channel-ID, Autor-ID, Längen
+# Eintrag im Offset-Index: Zeit (monoton, für bisect) und Position im Segment
+_INDEX = struct.Struct("<dQ")
+
+class _IndexView:
+    """Sequenz über einen Offset-Index im mmap, damit bisect direkt darauf sucht"""
+
+    def __init__(self, data, count: int, field: int):
+        self._data = data
+        self._count = count
+        self._field = field
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int):
+        return _INDEX.unpack_from(self._data, i * _INDEX.size)[self._field]
+
+class _Segment:
+    """Ein Segment aus Log- und Indexdatei, gelesen per mmap"""
+
+    def __init__(self, base_path: str):
+        self.log_path = base_path + ".log"
+        self.index_path = base_path + ".idx"
+        self._log_map = None
+        self._index_map = None
+        self._mapped_size = -1
+
+    def close(self):
+        for data in (self._log_map, self._index_map):
+            if data is not None:
+                data.close()
+        self._log_map = self._index_map = None
+        self._mapped_size = -1
+
+    def maps(self):
+        """Aktuelle mmaps von Log und Index; neu gemappt, wenn das Segment gewachsen ist"""
+        size = os.path.getsize(self.index_path)
+        if size != self._mapped_size:
+            self.close()
+            if size:
+                with open(self.index_path, 'rb') as f:
+                    self._index_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                with open(self.log_path, 'rb') as f:
+                    self._log_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_size = size
+        return self._log_map, self._index_map, size // _INDEX.size
+
+    def repair(self):
+        """Schneidet einen beim Absturz halb geschriebenen Rest ab"""
+        if not os.path.exists(self.index_path):
+            open(self.index_path, 'ab').close()
+        log_size = os.path.getsize(self.log_path)
+        with open(self.index_path, 'rb') as f:
+            index = f.read()
+        count = len(index) // _INDEX.size
+        valid_end = 0
+        while count:
+            _, offset = _INDEX.unpack_from(index, (count - 1) * _INDEX.size)
+            if offset + _RECORD.size <= log_size:
+                with open(self.log_path, 'rb') as f:
+                    f.seek(offset)
+                    header = _RECORD.unpack(f.read(_RECORD.size))
+                end = offset + _RECORD.size + sum(header[4:])
+                if end <= log_size:
+                    valid_end = end
+                    break
+            count -= 1
+        if count * _INDEX.size != len(index) or valid_end != log_size:
+            logging.warning(f"Archiv-Segment {self.log_path} repariert ({count} Nachrichten)")
+            with open(self.index_path, 'r+b') as f:
+                f.truncate(count * _INDEX.size)
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(valid_end)
+
+def _field(data, offset: int, header: tuple, number: int) -> str:
+    """Liest ein Textfeld (0 = Inhalt, 1 = Autor, 2 = Kanal, 3 = Anhänge) eines Records"""
+    start = offset + _RECORD.size + sum(header[4:4 + number])
+    return data[start:start + header[4 + number]].decode('utf-8')
+
+def _decode(data, offset: int) -> Dict:
+    header = _RECORD.unpack_from(data, offset)
+    timestamp, message_id = header[:2]
+    content, author, channel_name, attachments = (_field(data, offset, header, i) for i in range(4))
+    # Gleiche Form wie MessageRecord.to_dict, damit Treffer aus RAM und Archiv zusammenpassen
+    return {
+        'message_id': message_id,
+        'content': content,
+        'author': author,
+        'timestamp': datetime.fromtimestamp(timestamp, timezone.utc).isoformat(),
+        'channel_name': channel_name,
+        'attachments': attachments.split("\n") if attachments else []
+    }
+
+class _GuildArchive:
+    """Segmente eines Servers; geschrieben wird nur ins letzte"""
+
+    def __init__(self, directory: str, segment_size: int, max_segments: int,
+                 touch: Callable[[_Segment], None]):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self._touch = touch  # Meldet gemappte Segmente, damit kalte wieder geschlossen werden
+        os.makedirs(directory, exist_ok=True)
+        names = sorted(name[:-4] for name in os.listdir(directory) if name.endswith(".log"))
+        self.segments: List[_Segment] = [_Segment(os.path.join(directory, name)) for name in names]
+        self._log = None
+        self._index = None
+        self._last_key = 0.0
+        if self.segments:
+            self.segments[-1].repair()
+            _, index, count = self.segments[-1].maps()
+            self._touch(self.segments[-1])
+            if count:
+                self._last_key = _INDEX.unpack_from(index, (count - 1) * _INDEX.size)[0]
+
+    def _open_segment(self):
+        if not self.segments or os.path.getsize(self.segments[-1].log_path) >= self.segment_size:
+            number = int(os.path.basename(self.segments[-1].log_path)[:-4]) + 1 if self.segments else 1
+            self.segments.append(_Segment(os.path.join(self.directory, f"{number:08d}")))
+            while len(self.segments) > self.max_segments:
+                oldest = self.segments.pop(0)
+                oldest.close()
+                os.remove(oldest.log_path)
+                os.remove(oldest.index_path)
+        segment = self.segments[-1]
+        self._log = open(segment.log_path, 'ab')
+        self._index = open(segment.index_path, 'ab')
+
+    def append(self, timestamp: float, message_id: int, channel_id: int, author_id: int,
+               content: str, author: str, channel_name: str, attachments: List[str]):
+        if self._log is None or self._log.tell() >= self.segment_size:
+            self.close_files()
+            self._open_segment()
+        payload = [value.encode('utf-8') for value in (content, author, channel_name, "\n".join(attachments))]
+        offset = self._log.tell()
+        self._log.write(_RECORD.pack(timestamp, message_id, channel_id, author_id, *map(len, payload)))
+        for part in payload:
+            self._log.write(part)
+        # Der Index-Schlüssel ist monoton, auch wenn eine Nachricht mit älterer Zeit ankommt
+        self._last_key = max(self._last_key, timestamp)
+        self._index.write(_INDEX.pack(self._last_key, offset))
+
+    def flush(self):
+        if self._log is not None:
+            self._log.flush()
+            self._index.flush()
+
+    def close_files(self):
+        if self._log is not None:
+            self._log.close()
+            self._index.close()
+            self._log = self._index = None
+
+    def close(self):
+        self.close_files()
+        for segment in self.segments:
+            segment.close()
+
+    def scan(self, since: Optional[float], until: Optional[float]) -> Iterator[Tuple]:
+        """(mmap, Offset) der Nachrichten im Zeitraum, neueste zuerst"""
+        self.flush()
+        for segment in reversed(self.segments):
+            data, index, count = segment.maps()
+            self._touch(segment)
+            if not count:
+                continue
+            keys = _IndexView(index, count, 0)
+            start = bisect_left(keys, since) if since is not None else 0
+            end = bisect_right(keys, until) if until is not None else count
+            for i in range(end - 1, start - 1, -1):
+                yield data, _INDEX.unpack_from(index, i * _INDEX.size)[1]
+            if since is not None and start > 0:
+                break  # Ältere Segmente liegen komplett vor dem Zeitraum
+
+class MessageArchive:
+    """Persistenter Nachrichtenverlauf über das 100-Nachrichten-Fenster hinaus.
+
+    Pro Server werden Nachrichten in Segmentdateien angehängt (kompaktes
+    Binärformat) und über einen Offset-Index mit Zeitstempeln gefunden.
+    Gelesen wird per mmap, offen bleiben nur die Dateien der zuletzt
+    benutzten Server und Segmente.
+
+    Alle Dateizugriffe laufen nacheinander in einem eigenen Thread, der
+    Event-Loop reicht Nachrichten nur weiter und wartet auf Suchergebnisse.
+    Eine Suche endet spätestens nach `search_budget` Sekunden mit dem, was
+    bis dahin gefunden wurde.
+    """
+
+    def __init__(self, directory: str = "message_archive", segment_size: int = 16 * 1024 * 1024,
+                 max_segments: int = 64, max_open: int = 64, max_mapped: int = 16,
+                 search_budget: float = 1.0):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self.max_open = max_open
+        self.max_mapped = max_mapped
+        self.search_budget = search_budget
+        self._guilds: "OrderedDict[int, _GuildArchive]" = OrderedDict()
+        self._mapped: "OrderedDict[_Segment, None]" = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="message-archive")
+        self._pending: deque = deque()  # Vom Loop angehängt, vom Archiv-Thread geschrieben
+        self._draining = False
+        self._closed = False
+        self.searches = 0
+        self.incomplete_searches = 0
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(self.close)
+
+    def _touch(self, segment: _Segment):
+        self._mapped[segment] = None
+        self._mapped.move_to_end(segment)
+        while len(self._mapped) > self.max_mapped:
+            oldest, _ = self._mapped.popitem(last=False)
+            oldest.close()
+
+    def _get(self, guild_id: int) -> _GuildArchive:
+        archive = self._guilds.get(guild_id)
+        if archive is not None:
+            self._guilds.move_to_end(guild_id)
+            return archive
+        archive = _GuildArchive(
+            os.path.join(self.directory, str(guild_id)), self.segment_size, self.max_segments, self._touch
+        )
+        self._guilds[guild_id] = archive
+        # Nicht für jeden Server Dateien offen halten
+        while len(self._guilds) > self.max_open:
+            _, oldest = self._guilds.popitem(last=False)
+            oldest.close()
+        return archive
+
+    def append(self, message):
+        """Reicht eine Nachricht zum Anhängen an das Archiv ihres Servers weiter (kehrt sofort zurück)"""
+        if self._closed:
+            return
+        self._pending.append((
+            message.guild.id,
+            message.created_at.timestamp(),
+            message.id,
+            message.channel.id,
+            message.author.id,
+            message.content,
+            message.author.name,
+            message.channel.name,
+            [a.url for a in message.attachments]
+        ))
+        # Ein Auftrag schreibt alles, was sich bis dahin angesammelt hat
+        if not self._draining:
+            self._draining = True
+            try:
+                self._executor.submit(self._drain)
+            except RuntimeError:
+                pass  # close() läuft gerade und schreibt die wartenden Nachrichten selbst
+
+    def _drain(self):
+        self._draining = False  # Was ab jetzt kommt, plant einen neuen Auftrag ein
+        while self._pending:
+            guild_id, *record = self._pending.popleft()
+            try:
+                self._get(guild_id).append(*record)
+            except Exception as e:
+                logging.error(f"Fehler beim Archivieren der Nachricht: {str(e)}")
+
+    async def search(self, guild_id: int, terms=(), since: Optional[datetime] = None,
+                     until: Optional[datetime] = None, username: Optional[str] = None,
+                     channel_name: Optional[str] = None, limit: int = 10,
+                     exclude: Optional[Set[int]] = None) -> List[Dict]:
+        """Neueste archivierte Nachrichten, die auf alle Filter passen"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            partial(self._search, guild_id, terms, since, until, username, channel_name, limit, exclude)
+        )
+
+    def _search(self, guild_id: int, terms, since: Optional[datetime], until: Optional[datetime],
+                username: Optional[str], channel_name: Optional[str], limit: int,
+                exclude: Optional[Set[int]]) -> List[Dict]:
+        self._drain()
+        if not os.path.isdir(os.path.join(self.directory, str(guild_id))):
+            return []
+        self.searches += 1
+        deadline = time.monotonic() + self.search_budget
+        tokens = {token for term in terms for token in tokenize(term)}
+        username = username.lower() if username else None
+        channel_name = channel_name.lower() if channel_name else None
+
+        results = []
+        scan = self._get(guild_id).scan(
+            since.timestamp() if since else None,
+            until.timestamp() if until else None
+        )
+        # Es wird nur gelesen, was zum Filtern nötig ist; ganz dekodiert werden nur Treffer
+        for scanned, (data, offset) in enumerate(scan):
+            if not scanned % 1024 and time.monotonic() > deadline:
+                self.incomplete_searches += 1
+                logging.info(f"Archivsuche nach {self.search_budget:g}s abgebrochen, {len(results)} Treffer bis dahin")
+                break
+            header = _RECORD.unpack_from(data, offset)
+            if exclude and header[1] in exclude:
+                continue
+            if username and _field(data, offset, header, 1).lower() != username:
+                continue
+            if channel_name and _field(data, offset, header, 2).lower() != channel_name:
+                continue
+            if tokens:
+                content = fold(_field(data, offset, header, 0))
+                if not all(token in content for token in tokens) or not tokens.issubset(tokenize(content)):
+                    continue
+            results.append(_decode(data, offset))
+            if len(results) >= limit:
+                break
+        return results
+
+    def close(self):
+        """Schreibt noch wartende Nachrichten und schließt alle Dateien"""
+        if self._closed:
+            return
+        self._closed = True
+        self._executor.shutdown(wait=True)
+        self._drain()
+        for archive in self._guilds.values():
+            archive.close()
+        self._guilds.clear()
+        self._mapped.clear()
@@ -0,0 +1,54 @@
+import re
+from typing import Dict, Iterable, Optional, Set
+
+class _GuildRoute:
+    """Vorberechnete Kanal-IDs eines Servers, für Entscheidungen per Set-Lookup"""
+    __slots__ = ('bot_channels', 'allowed', 'untracked')
+
+    def __init__(self, bot_channels: Set[int], allowed: Optional[Set[int]], untracked: Set[int]):
+        self.bot_channels = bot_channels  # Jede Nachricht hier geht an den Bot
+        self.allowed = allowed  # Hier reagiert der Bot auf Erwähnung und Prefix, None = überall
+        self.untracked = untracked  # Nachrichten hier werden nicht gespeichert
+
+    def accepts(self, channel_id: int) -> bool:
+        return self.allowed is None or channel_id in self.allowed
+
+class MessageRouter:
+    """Entscheidet billig, ob eine Nachricht den Bot überhaupt betrifft.
+
+    Die Tabelle eines Servers wird beim ersten Zugriff aus den Kanalnamen der
+    Config gebaut und bei Kanaländerungen verworfen.
+    """
+
+    def __init__(self, bot_channel: str, allowed_channels: Iterable[str],
+                 untracked_channels: Iterable[str] = (), command_prefix: str = "/"):
+        self.bot_channel = bot_channel.lower()
+        self.allowed_channels = {name.lower() for name in allowed_channels}
+        self.untracked_channels = {name.lower() for name in untracked_channels}
+        # "bot ..." wie bisher ohne Groß-/Kleinschreibung, der Command-Prefix exakt
+        self.match_prefix = re.compile(
+            rf"(?P<bot>(?i:[@!]?bot))|(?P<command>{re.escape(command_prefix)})"
+        ).match
+        self._guilds: Dict[int, _GuildRoute] = {}
+
+    def get(self, guild) -> _GuildRoute:
+        route = self._guilds.get(guild.id)
+        if route is None:
+            route = self._guilds[guild.id] = self._build(guild)
+        return route
+
+    def _build(self, guild) -> _GuildRoute:
+        bot_channels, allowed, untracked = set(), set(), set()
+        for channel in guild.text_channels:
+            name = channel.name.lower()
+            if name == self.bot_channel:
+                bot_channels.add(channel.id)
+            if name in self.allowed_channels or name == self.bot_channel:
+                allowed.add(channel.id)
+            if name in self.untracked_channels:
+                untracked.add(channel.id)
+        return _GuildRoute(bot_channels, allowed if self.allowed_channels else None, untracked)
+
+    def remove_guild(self, guild_id: int):
+        """Verwirft die Tabelle; sie wird bei der nächsten Nachricht neu gebaut"""
+        self._guilds.pop(guild_id, None)
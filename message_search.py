@@ -0,0 +1,196 @@
+import re
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+_TOKEN = re.compile(r"\w+")
+
+# Umlaute werden wie ihre Umschreibung indiziert, "über" findet also auch "ueber"
+_UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue"})
+
+# Häufige Wörter, die bei der Suche nichts bringen
+STOPWORDS = {
+    "der", "die", "das", "den", "dem", "des", "ein", "eine", "einen", "einem", "einer",
+    "und", "oder", "aber", "ist", "sind", "war", "hat", "habe", "ich", "du", "er", "sie",
+    "es", "wir", "ihr", "mit", "von", "zu", "im", "in", "auf", "an", "am", "fuer", "nicht",
+    "auch", "noch", "so", "wie", "was", "wann", "wer", "the", "a", "and", "or", "to",
+}
+
+def fold(text: str) -> str:
+    """Kleinschreibung und Umlaute wie im Index; casefold macht aus ß schon ss"""
+    return text.casefold().translate(_UMLAUTS)
+
+def tokenize(text: str) -> List[str]:
+    """Zerlegt einen Text in normalisierte Suchbegriffe (ohne Füllwörter)"""
+    return [token for token in _TOKEN.findall(fold(text)) if token not in STOPWORDS]
+
+class _Postings:
+    """Nach Zeit sortierte Records, Zeitstempel parallel für bisect"""
+    __slots__ = ('times', 'records')
+
+    def __init__(self):
+        self.times: List[float] = []
+        self.records: List = []
+
+    def add(self, timestamp: float, record):
+        if not self.times or timestamp >= self.times[-1]:
+            self.times.append(timestamp)
+            self.records.append(record)
+        else:
+            # Selten: eine Nachricht kommt mit älterem Zeitstempel an
+            position = bisect_right(self.times, timestamp)
+            self.times.insert(position, timestamp)
+            self.records.insert(position, record)
+
+    def prune(self, removed: Set[int]):
+        keep = [i for i, record in enumerate(self.records) if record.seq not in removed]
+        self.times = [self.times[i] for i in keep]
+        self.records = [self.records[i] for i in keep]
+
+class SearchIndex:
+    """Invertierter Index über die Nachrichten eines Servers.
+
+    Jeder Suchbegriff zeigt auf seine Nachrichten, sortiert nach Zeit, sodass
+    Zeiträume per bisect gefunden werden. Verworfene Nachrichten werden nur
+    markiert und erst aufgeräumt, wenn sie die Hälfte des Index ausmachen.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, _Postings] = {}
+        self.timeline = _Postings()  # Alle Nachrichten, für Suchen ohne Begriff
+        self._removed: Set[int] = set()
+
+    def add(self, record):
+        timestamp = record.created_at.timestamp()
+        self.timeline.add(timestamp, record)
+        for token in set(tokenize(record.content)):
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = _Postings()
+            postings.add(timestamp, record)
+
+    def remove(self, record):
+        self._removed.add(record.seq)
+        if len(self._removed) * 2 > len(self.timeline.records):
+            self._prune()
+
+    def _prune(self):
+        for token in list(self.postings):
+            postings = self.postings[token]
+            postings.prune(self._removed)
+            if not postings.records:
+                del self.postings[token]
+        self.timeline.prune(self._removed)
+        self._removed.clear()
+
+    def search(self, terms: Iterable[str] = (), since: Optional[datetime] = None,
+               until: Optional[datetime] = None, author: Optional[str] = None,
+               channel_id: Optional[int] = None, limit: int = 10) -> List:
+        """Neueste Nachrichten, die alle Begriffe enthalten, im Zeitraum [since, until]"""
+        tokens = {token for term in terms for token in tokenize(term)}
+        if tokens:
+            candidates = [self.postings.get(token) for token in tokens]
+            if not all(candidates):
+                return []
+            # Die kürzeste Liste durchgehen, die anderen Begriffe am Text prüfen
+            postings = min(candidates, key=lambda p: len(p.records))
+        else:
+            postings = self.timeline
+
+        start = bisect_left(postings.times, since.timestamp()) if since else 0
+        end = bisect_right(postings.times, until.timestamp()) if until else len(postings.times)
+        author = author.lower() if author else None
+
+        results = []
+        for i in range(end - 1, start - 1, -1):
+            record = postings.records[i]
+            if record.seq in self._removed:
+                continue
+            if author and record.author.lower() != author:
+                continue
+            if channel_id is not None and record.channel_id != channel_id:
+                continue
+            if len(tokens) > 1 and not tokens.issubset(tokenize(record.content)):
+                continue
+            results.append(record)
+            if len(results) >= limit:
+                break
+        return results
+
+class SearchQuery:
+    """Aus einer Anfrage wie "wann hat anna über release geschrieben" gelesene Filter"""
+
+    def __init__(self):
+        self.terms: List[str] = []
+        self.user: Optional[str] = None
+        self.channel: Optional[str] = None
+        self.since: Optional[datetime] = None
+        self.until: Optional[datetime] = None
+
+    def is_search(self) -> bool:
+        """Ob mehr gefragt ist als nur die letzte Nachricht"""
+        return bool(self.terms or self.since or self.until)
+
+_QUOTED = re.compile(r"[\"'„“”‚‘’]([^\"'„“”‚‘’]+)[\"'„“”‚‘’]")
+_RELATIVE = re.compile(r"(?:seit|in den letzten|letzten)\s+(\d+)\s+(minuten|minute|stunden|stunde|tagen|tage|tag|wochen|woche)\b")
+_UNITS = {"minute": 60, "stunde": 3600, "tag": 86400, "woche": 604800}
+# Wörter, die nur ankündigen, dass ein Suchbegriff folgt ("zum thema deploy")
+_TOPIC_FILLER = {"thema", "themen", "stichwort", "begriff", "wort", "inhalt", "topic", "nachricht", "nachrichten"}
+# Wörter, nach denen der Suchbegriff beginnt
+_TOPIC_TRIGGERS = ("über", "ueber", "zu", "zum", "zur", "mit", "nach")
+# Einleitungen wie "suche nach nachrichten über hallo"; ihr "nach" gehört nicht zum Suchbegriff
+_SEARCH_COMMANDS = re.compile(r"\b(?:suche\s+nach\s+nachrichten|suche\s+nachrichten|finde\s+nachrichten)\b")
+
+def _start_of_day(now: datetime) -> datetime:
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def parse_search_query(query: str, now: Optional[datetime] = None) -> SearchQuery:
+    """Liest Suchbegriffe, User, Kanal und Zeitraum aus einer deutschen Anfrage"""
+    now = now or datetime.now().astimezone()
+    parsed = SearchQuery()
+    text = query.lower()
+
+    # Begriffe in Anführungszeichen gelten wörtlich
+    parsed.terms.extend(_QUOTED.findall(query))
+    text = _QUOTED.sub(" ", text)
+    text = _SEARCH_COMMANDS.sub(" ", text)
+
+    relative = _RELATIVE.search(text)
+    if relative:
+        amount, unit = int(relative.group(1)), relative.group(2)
+        seconds = next(value for prefix, value in _UNITS.items() if unit.startswith(prefix))
+        parsed.since = now - timedelta(seconds=amount * seconds)
+        text = text[:relative.start()] + " " + text[relative.end():]
+    elif "seit gestern" in text:
+        parsed.since = _start_of_day(now) - timedelta(days=1)
+    elif "gestern" in text:
+        parsed.since = _start_of_day(now) - timedelta(days=1)
+        parsed.until = _start_of_day(now)
+    elif "heute" in text:
+        parsed.since = _start_of_day(now)
+    elif "diese woche" in text:
+        parsed.since = _start_of_day(now) - timedelta(days=now.weekday())
+    elif "letzte woche" in text or "seit einer woche" in text:
+        parsed.since = now - timedelta(days=7)
+
+    words = text.replace("?", " ").split()
+    for i, word in enumerate(words):
+        following = words[i + 1] if i + 1 < len(words) else None
+        if not following:
+            continue
+        if word in ("von", "user", "nutzer") or (word == "hat" and i > 0 and words[i - 1] == "wann"):
+            if following not in ("jemand", "wer", "irgendwer"):
+                parsed.user = following.strip('@"')
+        elif word in ("in", "kanal", "channel"):
+            parsed.channel = following.strip('"#')
+        elif word in _TOPIC_TRIGGERS and not parsed.terms:
+            # "über release geschrieben" -> alles bis zum Verb ist der Suchbegriff;
+            # bei "nach nachrichten über hallo" beginnt er erst nach "über"
+            topic = []
+            for candidate in words[i + 1:]:
+                if candidate in ("geschrieben", "gesagt", "geredet", "gesprochen", "seit", "in", "von",
+                                 "heute", "gestern", "diese", "letzte") or candidate in _TOPIC_TRIGGERS:
+                    break
+                topic.append(candidate.strip('.,!"'))
+            parsed.terms.extend(term for term in topic if term and term not in _TOPIC_FILLER)
+    return parsed
@@ -0,0 +1,213 @@
+import heapq
+import sys
+from collections import deque
+from itertools import count
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from memory_budget import MemoryBudget
+from message_archive import MessageArchive
+from message_search import SearchIndex
+
+# Grob geschätzter Speicher eines Records ohne Inhalt (Objekt, Slots, Deque- und Index-Einträge)
+_RECORD_OVERHEAD = 200
+
+class MessageRecord:
+    """Eine getrackte Nachricht; Zeitstempel wird erst beim Lesen formatiert"""
+    __slots__ = ('seq', 'message_id', 'channel_id', 'content', 'author', 'channel_name', 'created_at', 'attachments')
+
+    def __init__(self, seq: int, message):
+        self.seq = seq
+        self.message_id = message.id
+        self.channel_id = message.channel.id
+        self.content = message.content
+        # Namen wiederholen sich ständig, alle Records teilen sich einen String
+        self.author = sys.intern(message.author.name)
+        self.channel_name = sys.intern(message.channel.name)
+        self.created_at = message.created_at
+        self.attachments = tuple(a.url for a in message.attachments)
+
+    def size(self) -> int:
+        """Geschätzter Speicherbedarf in Bytes"""
+        return _RECORD_OVERHEAD + len(self.content) + sum(len(url) for url in self.attachments)
+
+    def to_dict(self) -> dict:
+        return {
+            'message_id': self.message_id,
+            'content': self.content,
+            'author': self.author,
+            'timestamp': self.created_at.isoformat(),
+            'channel_name': self.channel_name,
+            'attachments': list(self.attachments)
+        }
+
+class _GuildMessages:
+    """Nachrichten eines Servers mit Indizes nach Kanalname und Autor"""
+
+    def __init__(self):
+        self.channels: Dict[int, deque] = {}  # Channel-ID -> Ringpuffer
+        self.channel_ids: Dict[str, int] = {}  # Kanalname (klein) -> Channel-ID
+        self.by_author: Dict[str, Dict[int, deque]] = {}  # Autor (klein) -> Channel-ID -> Records
+        self.latest: Optional[MessageRecord] = None
+        self.search = SearchIndex()
+
+class MessageTracker:
+    def __init__(self, max_messages_per_channel: int = 100, budget: Optional[MemoryBudget] = None,
+                 archive: Optional[MessageArchive] = None):
+        self.message_history: Dict[int, _GuildMessages] = {}  # Guild ID -> Nachrichten
+        self.max_messages_per_channel = max_messages_per_channel
+        self._seq = count()
+        self.budget = budget
+        self.archive = archive  # Ältere Nachrichten, auch über Neustarts hinweg
+        if budget is not None:
+            budget.register("channel", self._evict_channel)
+
+    def add_message(self, message):
+        """Fügt eine neue Nachricht zum Tracking hinzu"""
+        if self.archive is not None:
+            self.archive.append(message)
+
+        guild = self.message_history.get(message.guild.id)
+        if guild is None:
+            guild = self.message_history[message.guild.id] = _GuildMessages()
+
+        record = MessageRecord(next(self._seq), message)
+        channel = guild.channels.get(record.channel_id)
+        if channel is None:
+            channel = guild.channels[record.channel_id] = deque(maxlen=self.max_messages_per_channel)
+        guild.channel_ids[record.channel_name.lower()] = record.channel_id
+
+        # Der Ringpuffer verwirft die älteste Nachricht selbst, der Autor-Index muss mit
+        delta = record.size()
+        if len(channel) == channel.maxlen:
+            delta -= channel[0].size()
+            self._unindex_author(guild, channel[0])
+            guild.search.remove(channel[0])
+        channel.append(record)
+        guild.by_author.setdefault(record.author.lower(), {}).setdefault(record.channel_id, deque()).append(record)
+        guild.latest = record
+        guild.search.add(record)
+
+        if self.budget is not None:
+            self.budget.charge("channel", (message.guild.id, record.channel_id), message.guild.id, delta)
+
+    @staticmethod
+    def _unindex_author(guild: _GuildMessages, record: MessageRecord):
+        author = record.author.lower()
+        channels = guild.by_author[author]
+        # Pro Kanal und Autor sind die Records in Eingangsreihenfolge, die älteste steht vorne
+        channels[record.channel_id].popleft()
+        if not channels[record.channel_id]:
+            del channels[record.channel_id]
+            if not channels:
+                del guild.by_author[author]
+
+    def _evict_channel(self, key: Tuple[int, int]):
+        """Verwirft den Verlauf eines Kanals (vom Speicherlimit aufgerufen)"""
+        guild_id, channel_id = key
+        guild = self.message_history.get(guild_id)
+        if guild is None:
+            return
+        channel = guild.channels.pop(channel_id, None)
+        if channel is None:
+            return
+
+        for record in channel:
+            guild.search.remove(record)
+        for author in {record.author.lower() for record in channel}:
+            channels = guild.by_author[author]
+            del channels[channel_id]
+            if not channels:
+                del guild.by_author[author]
+        for name in [name for name, known_id in guild.channel_ids.items() if known_id == channel_id]:
+            del guild.channel_ids[name]
+
+        if not guild.channels:
+            del self.message_history[guild_id]
+        elif guild.latest is not None and guild.latest.channel_id == channel_id:
+            guild.latest = max((records[-1] for records in guild.channels.values()), key=lambda record: record.seq)
+
+    def remove_guild(self, guild_id: int):
+        """Vergisst alle Nachrichten eines Servers"""
+        guild = self.message_history.pop(guild_id, None)
+        if guild is not None and self.budget is not None:
+            for channel_id in guild.channels:
+                self.budget.release("channel", (guild_id, channel_id))
+
+    def _channel(self, guild: _GuildMessages, channel_name: str) -> Optional[deque]:
+        channel_id = guild.channel_ids.get(channel_name.lower())
+        if channel_id is None:
+            return None
+        return guild.channels.get(channel_id)
+
+    def get_channel_history(self, guild_id, channel_name) -> list:
+        """Gibt die Historie eines Kanals zurück"""
+        guild = self.message_history.get(guild_id)
+        if guild is None:
+            return []
+        channel = self._channel(guild, channel_name)
+        return [record.to_dict() for record in channel or ()]
+
+    def get_user_messages(self, guild_id, username) -> list:
+        """Gibt alle Nachrichten eines Benutzers zurück"""
+        guild = self.message_history.get(guild_id)
+        if guild is None:
+            return []
+        channels = guild.by_author.get(username.lower(), {})
+        merged = heapq.merge(*channels.values(), key=lambda record: record.seq)
+        return [record.to_dict() for record in merged]
+
+    async def get_latest_message(self, guild_id, channel_name=None, username=None, until=None) -> dict:
+        """Gibt die letzte Nachricht zurück, optional gefiltert nach Kanal, Benutzer oder Zeitpunkt"""
+        if until is not None:
+            # Mit Obergrenze über den Index, dort wird der Zeitraum per bisect eingegrenzt
+            found = await self.search(guild_id, until=until, username=username, channel_name=channel_name, limit=1)
+            return found[0] if found else None
+
+        guild = self.message_history.get(guild_id)
+        if guild is None:
+            return await self._latest_from_archive(guild_id, channel_name, username)
+
+        if username:
+            channels = guild.by_author.get(username.lower(), {})
+            if channel_name:
+                channel_id = guild.channel_ids.get(channel_name.lower())
+                candidates = [channels[channel_id]] if channel_id in channels else []
+            else:
+                candidates = channels.values()
+            latest = max((records[-1] for records in candidates), key=lambda record: record.seq, default=None)
+        elif channel_name:
+            channel = self._channel(guild, channel_name)
+            latest = channel[-1] if channel else None
+        else:
+            latest = guild.latest
+
+        if latest is None:
+            return await self._latest_from_archive(guild_id, channel_name, username)
+        return latest.to_dict()
+
+    async def _latest_from_archive(self, guild_id, channel_name, username) -> Optional[dict]:
+        if self.archive is None:
+            return None
+        found = await self.archive.search(guild_id, username=username, channel_name=channel_name, limit=1)
+        return found[0] if found else None
+
+    async def search(self, guild_id, terms=(), since=None, until=None, username=None,
+               channel_name=None, limit: int = 10) -> list:
+        """Neueste Nachrichten mit allen Suchbegriffen, optional nach Zeitraum, User und Kanal"""
+        found = []
+        guild = self.message_history.get(guild_id)
+        if guild is not None:
+            channel_id = guild.channel_ids.get(channel_name.lower()) if channel_name else None
+            if not channel_name or channel_id is not None:
+                records = guild.search.search(terms, since, until, username, channel_id, limit)
+                found = [record.to_dict() for record in records]
+
+        # Reicht der RAM nicht, geht die Suche im Archiv weiter
+        if self.archive is not None and len(found) < limit:
+            found += await self.archive.search(
+                guild_id, terms, since, until, username, channel_name,
+                limit=limit - len(found),
+                exclude={message['message_id'] for message in found}
+            )
+            found.sort(key=lambda message: datetime.fromisoformat(message['timestamp']), reverse=True)
+        return found
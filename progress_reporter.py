@@ -0,0 +1,135 @@
+import asyncio
+import logging
+from typing import Dict, Optional
+
+class ProgressStats:
+    """Zählt, wie viele Discord-API-Aufrufe die Fortschrittsanzeige gespart hat"""
+
+    def __init__(self):
+        self.requests = 0
+        self.updates = 0  # Gewünschte Statusänderungen (früher je ein API-Aufruf)
+        self.api_calls = 0  # Tatsächlich gesendete Nachrichten und Edits
+        self.typing_calls = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            'requests': self.requests,
+            'updates': self.updates,
+            'api_calls': self.api_calls,
+            'typing_calls': self.typing_calls,
+            'saved_calls': self.updates - self.api_calls - self.typing_calls
+        }
+
+class ProgressReporter:
+    """Zeigt den Fortschritt einer Anfrage mit möglichst wenigen API-Aufrufen an.
+
+    Statusänderungen werden gesammelt und höchstens alle `interval` Sekunden als
+    Edit geschickt; überholte Zwischenstände fallen weg. Mit `use_typing` zeigt
+    der Bot zuerst nur "schreibt..." an und schickt eine Platzhalter-Nachricht
+    erst, wenn die Anfrage länger als `placeholder_delay` Sekunden dauert.
+    """
+
+    def __init__(self, channel, stats: ProgressStats, interval: float = 1.5,
+                 placeholder_delay: float = 2.0, use_typing: bool = True):
+        self.channel = channel
+        self.stats = stats
+        self.interval = interval
+        self.placeholder_delay = placeholder_delay
+        self.use_typing = use_typing
+        self.message = None
+        self._pending: Optional[str] = None
+        self._shown: Optional[str] = None
+        self._last_edit = 0.0
+        self._flush_task: Optional[asyncio.Task] = None
+        self._typing = None
+        self._finished = False
+        self._flushing = False
+
+    async def start(self, content: str):
+        """Beginnt die Anzeige mit einem ersten Status"""
+        self.stats.requests += 1
+        self.stats.updates += 1
+        self._pending = content
+
+        if not self.use_typing:
+            await self._flush()
+            return
+
+        try:
+            self._typing = self.channel.typing()
+            await self._typing.__aenter__()
+            self.stats.typing_calls += 1
+        except Exception as e:
+            logging.warning(f"Tipp-Anzeige konnte nicht gestartet werden: {str(e)}")
+            self._typing = None
+        self._flush_task = asyncio.create_task(self._flush_later(self.placeholder_delay))
+
+    async def update(self, content: str):
+        """Setzt einen neuen Status; er wird gebündelt mit anderen angezeigt"""
+        if self._finished:
+            return
+        self.stats.updates += 1
+        self._pending = content
+
+        if self._flush_task and not self._flush_task.done():
+            return  # Ein Edit ist schon geplant und nimmt den neuesten Stand mit
+        loop = asyncio.get_running_loop()
+        delay = max(0.0, self._last_edit + self.interval - loop.time())
+        self._flush_task = asyncio.create_task(self._flush_later(delay))
+
+    async def finish(self, content: str):
+        """Zeigt das Endergebnis an; dafür wird höchstens ein API-Aufruf gemacht"""
+        self._finished = True
+        self.stats.updates += 1
+
+        if self._flush_task and not self._flush_task.done():
+            if self._flushing:
+                # Ein laufendes Senden nicht abbrechen, sonst gibt es den Platzhalter doppelt
+                await asyncio.wait([self._flush_task])
+            else:
+                self._flush_task.cancel()
+                try:
+                    await self._flush_task
+                except asyncio.CancelledError:
+                    pass
+        await self._stop_typing()
+
+        self._pending = content
+        await self._flush()
+        logging.debug(f"Fortschrittsanzeige: {self.stats.get_stats()}")
+
+    async def _flush_later(self, delay: float):
+        await asyncio.sleep(delay)
+        try:
+            while self._pending is not None and not self._finished:
+                await self._flush()
+                if self._pending is not None and not self._finished:
+                    await asyncio.sleep(self.interval)
+        except Exception as e:
+            # Ein verlorener Zwischenstand ist egal, das Endergebnis kommt mit finish()
+            logging.warning(f"Fortschritt konnte nicht angezeigt werden: {str(e)}")
+
+    async def _flush(self):
+        content, self._pending = self._pending, None
+        if content is None or content == self._shown:
+            return
+
+        self._flushing = True
+        try:
+            if self.message is None:
+                self.message = await self.channel.send(content)
+            else:
+                await self.message.edit(content=content)
+        finally:
+            self._flushing = False
+        self._shown = content
+        self._last_edit = asyncio.get_running_loop().time()
+        self.stats.api_calls += 1
+
+    async def _stop_typing(self):
+        if self._typing is not None:
+            typing, self._typing = self._typing, None
+            try:
+                await typing.__aexit__(None, None, None)
+            except Exception as e:
+                logging.warning(f"Tipp-Anzeige konnte nicht beendet werden: {str(e)}")
@@ -0,0 +1,110 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+class _Bucket:
+    __slots__ = ('tokens', 'updated', 'notified')
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+        self.notified = False
+
+class TokenBucket:
+    """Token-Buckets gleicher Größe, einer pro Schlüssel.
+
+    Pro Anfrage wird ein Token verbraucht, nachgefüllt werden `rate` Tokens pro
+    Sekunde bis `capacity`. Ein Bucket, der lange genug unbenutzt war, um wieder
+    voll zu sein, verhält sich wie ein neuer und wird deshalb verworfen.
+    """
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.idle_after = capacity / rate  # Sekunden, bis ein leerer Bucket wieder voll ist
+        self._buckets: "OrderedDict[Hashable, _Bucket]" = OrderedDict()
+        self.rejected = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def get(self, key: Hashable, now: float) -> _Bucket:
+        """Bucket mit aufgefülltem Stand; zuletzt benutzte liegen hinten"""
+        self._expire(now)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(self.capacity, now)
+        else:
+            bucket.tokens = min(self.capacity, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def wait_time(self, bucket: _Bucket) -> float:
+        """Sekunden, bis wieder ein ganzes Token da ist"""
+        return max(0.0, (1 - bucket.tokens) / self.rate)
+
+    def _expire(self, now: float):
+        # Vorne liegt der am längsten unbenutzte Bucket, das Aufräumen endet beim ersten aktiven
+        while self._buckets:
+            bucket = next(iter(self._buckets.values()))
+            if now - bucket.updated < self.idle_after:
+                break
+            self._buckets.popitem(last=False)
+            self.expired += 1
+
+class Throttle:
+    """Ergebnis einer abgelehnten Anfrage"""
+    __slots__ = ('scope', 'retry_after', 'notify')
+
+    def __init__(self, scope: str, retry_after: float, notify: bool):
+        self.scope = scope
+        self.retry_after = retry_after
+        self.notify = notify  # Nur die erste Ablehnung in Folge bekommt eine Antwort
+
+class RateLimiter:
+    """Begrenzt Anfragen an den Bot getrennt pro User, Kanal und Server"""
+
+    def __init__(self, user: Tuple[float, float], channel: Tuple[float, float], guild: Tuple[float, float]):
+        # Je (Kapazität, Tokens pro Sekunde)
+        self.scopes: Dict[str, TokenBucket] = {
+            'user': TokenBucket(*user),
+            'channel': TokenBucket(*channel),
+            'guild': TokenBucket(*guild)
+        }
+        self.allowed = 0
+        self.notices = 0
+
+    def check(self, guild_id: Hashable, channel_id: Hashable, user_id: Hashable) -> Optional[Throttle]:
+        """Verbraucht je ein Token aller drei Buckets oder gibt zurück, woran es scheitert"""
+        now = time.monotonic()
+        buckets = [
+            (scope, limiter, limiter.get(key, now))
+            for (scope, limiter), key in zip(self.scopes.items(), (user_id, channel_id, guild_id))
+        ]
+
+        # Erst prüfen, dann abbuchen: eine abgelehnte Anfrage kostet keinen Bucket ein Token
+        empty = [(scope, limiter, bucket) for scope, limiter, bucket in buckets if bucket.tokens < 1]
+        if empty:
+            scope, limiter, bucket = max(empty, key=lambda entry: entry[1].wait_time(entry[2]))
+            limiter.rejected += 1
+            notify = not bucket.notified
+            bucket.notified = True
+            if notify:
+                self.notices += 1
+            return Throttle(scope, limiter.wait_time(bucket), notify)
+
+        for _, _, bucket in buckets:
+            bucket.tokens -= 1
+            bucket.notified = False
+        self.allowed += 1
+        return None
+
+    def get_stats(self) -> Dict[str, int]:
+        stats = {'allowed': self.allowed, 'notices': self.notices}
+        for scope, limiter in self.scopes.items():
+            stats[f'rejected_{scope}'] = limiter.rejected
+            stats[f'active_{scope}'] = len(limiter)
+            stats[f'expired_{scope}'] = limiter.expired
+        return stats
@@ -0,0 +1,99 @@
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+# Aktionen, die den Server nicht verändern. Nur Antworten, die ausschließlich
+# aus solchen Aktionen bestehen, dürfen wiederverwendet werden.
+CACHEABLE_ACTIONS = {
+    "send_message",
+    "analyze_channels",
+    "analyze_roles",
+    "list_commands",
+    "list_users",
+    "get_user_info",
+    "search_messages",
+}
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_input(user_input: str) -> str:
+    """Vereinheitlicht eine Anfrage, damit 'Hallo!' und 'hallo' gleich behandelt werden"""
+    text = _WHITESPACE.sub(" ", user_input.casefold()).strip()
+    return text.strip(" .!?,;:")
+
+def hash_guild_state(channel_names: Iterable[str], command_names: Iterable[str]) -> str:
+    """Fingerabdruck des Server-Zustands, von dem der Prompt abhängt"""
+    digest = hashlib.sha1()
+    digest.update("\n".join(sorted(channel_names)).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update("\n".join(sorted(command_names)).encode("utf-8"))
+    return digest.hexdigest()
+
+class ResponseCache:
+    """LRU-Cache mit Ablaufzeit für KI-Antworten auf wiederkehrende Anfragen"""
+
+    def __init__(self, max_size: int = 256, ttl: float = 600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()  # (Eingabe, Channel-ID, Zustand) -> (Zeitstempel, Antwort)
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+
+    def get(self, user_input: str, channel_id: int, state_hash: str) -> Optional[str]:
+        """Gibt eine gespeicherte Antwort zurück oder None"""
+        if self.max_size <= 0:
+            return None
+
+        # Pro Kanal: Gedächtnis und Standard-Zielkanal der Antwort hängen vom Kanal ab
+        key = (normalize_input(user_input), channel_id, state_hash)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stored_at, response = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return response
+
+    def put(self, user_input: str, channel_id: int, state_hash: str, response: str, actions: List[Dict]) -> bool:
+        """Speichert eine Antwort, sofern sie keine verändernden Aktionen enthält"""
+        if self.max_size <= 0 or not response.strip():
+            return False
+
+        if not actions or any(a.get("action") not in CACHEABLE_ACTIONS for a in actions):
+            self.bypassed += 1
+            return False
+
+        key = (normalize_input(user_input), channel_id, state_hash)
+        self._entries[key] = (time.monotonic(), response)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return True
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, float]:
+        """Trefferstatistik des Caches"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'bypassed': self.bypassed,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits / lookups * 100) if lookups else 0.0
+        }
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+
+class QueueFullError(Exception):
+    """Die Warteschlange ist voll, die Anfrage wird abgelehnt"""
+
+class _Ticket:
+    __slots__ = ('guild_id', 'user_id', 'position', 'granted', 'changed')
+
+    def __init__(self, guild_id: Hashable, user_id: Hashable):
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.position = 0
+        self.granted = False
+        self.changed = asyncio.Event()
+
+class SchedulerLease:
+    """Ein belegter Platz im Scheduler, wird mit release() wieder freigegeben"""
+
+    def __init__(self, scheduler: "FairScheduler"):
+        self._scheduler = scheduler
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._scheduler._release()
+
+class FairScheduler:
+    """Verteilt KI-Anfragen reihum auf Server und innerhalb eines Servers reihum auf User"""
+
+    def __init__(self, max_concurrent: int, max_queue: int, max_queue_per_guild: int):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queue_per_guild = max_queue_per_guild
+        self.active = 0
+        self.queued = 0
+        self.rejected = 0
+        self.dispatched = 0
+        # Guild -> User -> wartende Tickets; die Reihenfolge der Guilds ist die Rundenreihenfolge
+        self._queues: "OrderedDict[Hashable, OrderedDict[Hashable, Deque[_Ticket]]]" = OrderedDict()
+        self._guild_counts: Dict[Hashable, int] = {}
+
+    async def acquire(self, guild_id: Hashable, user_id: Hashable,
+                      on_position: Optional[Callable[[int], Awaitable]] = None) -> SchedulerLease:
+        """Wartet auf einen freien Platz. on_position wird mit der aktuellen Warteposition aufgerufen."""
+        if self.active < self.max_concurrent and not self.queued:
+            self.active += 1
+            self.dispatched += 1
+            return SchedulerLease(self)
+
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError("Ich bin gerade total überlastet! Versuch es gleich nochmal. 😵")
+        if self._guild_counts.get(guild_id, 0) >= self.max_queue_per_guild:
+            self.rejected += 1
+            raise QueueFullError("Auf diesem Server warten schon zu viele Anfragen! Immer mit der Ruhe. 😤")
+
+        ticket = _Ticket(guild_id, user_id)
+        self._enqueue(ticket)
+        self._dispatch()
+        self._update_positions()
+
+        reported = None
+        try:
+            while not ticket.granted:
+                if on_position and ticket.position != reported:
+                    reported = ticket.position
+                    try:
+                        await on_position(reported)
+                    except Exception as e:
+                        logging.warning(f"Warteposition konnte nicht angezeigt werden: {str(e)}")
+                    continue
+                ticket.changed.clear()
+                await ticket.changed.wait()
+        except BaseException:
+            if ticket.granted:
+                self._release()
+            else:
+                self._remove(ticket)
+                self._update_positions()
+            raise
+
+        return SchedulerLease(self)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            'active': self.active,
+            'queued': self.queued,
+            'dispatched': self.dispatched,
+            'rejected': self.rejected,
+            'waiting_guilds': len(self._queues)
+        }
+
+    def _enqueue(self, ticket: _Ticket):
+        users = self._queues.setdefault(ticket.guild_id, OrderedDict())
+        users.setdefault(ticket.user_id, deque()).append(ticket)
+        self._guild_counts[ticket.guild_id] = self._guild_counts.get(ticket.guild_id, 0) + 1
+        self.queued += 1
+
+    def _remove(self, ticket: _Ticket):
+        users = self._queues.get(ticket.guild_id)
+        if not users or ticket not in users.get(ticket.user_id, ()):
+            return
+        users[ticket.user_id].remove(ticket)
+        if not users[ticket.user_id]:
+            del users[ticket.user_id]
+        if not users:
+            del self._queues[ticket.guild_id]
+        self._decrement(ticket.guild_id)
+
+    def _decrement(self, guild_id: Hashable):
+        self.queued -= 1
+        self._guild_counts[guild_id] -= 1
+        if not self._guild_counts[guild_id]:
+            del self._guild_counts[guild_id]
+
+    def _pop_next(self) -> _Ticket:
+        # Nächste Guild ist vorne; sie kommt danach ans Ende der Runde
+        guild_id, users = next(iter(self._queues.items()))
+        user_id, tickets = next(iter(users.items()))
+        ticket = tickets.popleft()
+
+        if tickets:
+            users.move_to_end(user_id)
+        else:
+            del users[user_id]
+        if users:
+            self._queues.move_to_end(guild_id)
+        else:
+            del self._queues[guild_id]
+
+        self._decrement(guild_id)
+        return ticket
+
+    def _dispatch(self):
+        while self.active < self.max_concurrent and self.queued:
+            ticket = self._pop_next()
+            self.active += 1
+            self.dispatched += 1
+            ticket.granted = True
+            ticket.changed.set()
+
+    def _release(self):
+        self.active -= 1
+        self._dispatch()
+        self._update_positions()
+
+    def _update_positions(self):
+        """Spielt die Rundenreihenfolge durch und teilt jedem Ticket seinen Platz mit"""
+        rounds: List[List[Deque[_Ticket]]] = [
+            [deque(tickets) for tickets in users.values()]
+            for users in self._queues.values()
+        ]
+        position = 0
+        while rounds:
+            next_round = []
+            for guild_queues in rounds:
+                tickets = guild_queues.pop(0)
+                ticket = tickets.popleft()
+                position += 1
+                if ticket.position != position:
+                    ticket.position = position
+                    ticket.changed.set()
+                if tickets:
+                    guild_queues.append(tickets)
+                if guild_queues:
+                    next_round.append(guild_queues)
+            rounds = next_round
@@ -0,0 +1,42 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+class SingleFlight:
+    """Fasst gleichzeitige, identische Aufrufe zu einem einzigen zusammen"""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Führt func aus oder wartet auf den laufenden Aufruf mit gleichem Schlüssel.
+
+        Gibt das Ergebnis und ob es von einem anderen Aufruf übernommen wurde zurück.
+        """
+        future = self._flights.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # shield: bricht ein Wartender ab, läuft der gemeinsame Aufruf weiter
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._flights[key] = future
+        self.leaders += 1
+        try:
+            result = await func()
+        except BaseException as e:
+            if not isinstance(e, Exception):
+                e = RuntimeError("Die gleiche Anfrage wurde abgebrochen!")
+            future.set_exception(e)
+            future.exception()  # Ohne Wartende soll asyncio nicht warnen
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._flights[key]
@@ -0,0 +1,31 @@
+import unittest
+from intent_router import IntentRouter
+
+class IntentRouterTest(unittest.TestCase):
+    def setUp(self):
+        self.router = IntentRouter(threshold=0.8)
+
+    def assertRoutes(self, text: str, action: str):
+        routed = self.router.route(text)
+        self.assertIsNotNone(routed, text)
+        self.assertEqual(routed[0], action, text)
+
+    def test_unambiguous_requests_take_the_fast_path(self):
+        self.assertRoutes("zeige mir alle rollen", "analyze_roles")
+        self.assertRoutes("Zeig mir bitte mal alle Befehle!", "list_commands")
+        self.assertRoutes("analysiere die kanäle auf dem server", "analyze_channels")
+        self.assertRoutes("wer ist alles hier?", "list_users")
+        self.assertRoutes("befehle", "list_commands")
+
+    def test_requests_with_more_detail_go_to_the_ai(self):
+        for text in (
+            "zeig mir die user info von max",
+            "wer ist hier der boss",
+            "zeige alle mitglieder mit der rolle admin",
+            "zeige mir die rollen von max",
+            "zeige mir die befehle für musik",
+        ):
+            self.assertIsNone(self.router.route(text), text)
+
+if __name__ == "__main__":
+    unittest.main()
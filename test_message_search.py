@@ -0,0 +1,54 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from message_search import SearchIndex, parse_search_query
+
+NOW = datetime(2026, 10, 18, 15, 30, tzinfo=timezone.utc)
+MIDNIGHT = datetime(2026, 10, 18, tzinfo=timezone.utc)
+
+class ParseSearchQueryTest(unittest.TestCase):
+    def parse(self, query: str):
+        return parse_search_query(query, now=NOW)
+
+    def test_search_commands_are_not_part_of_the_terms(self):
+        self.assertEqual(self.parse("suche nach nachrichten über hallo").terms, ["hallo"])
+        self.assertEqual(self.parse("suche nachrichten mit hallo").terms, ["hallo"])
+        self.assertEqual(self.parse("finde nachrichten zu deploy").terms, ["deploy"])
+
+    def test_search_command_with_user_only(self):
+        parsed = self.parse("suche nach nachrichten von max")
+        self.assertEqual(parsed.terms, [])
+        self.assertEqual(parsed.user, "max")
+
+    def test_user_and_topic(self):
+        parsed = self.parse("wann hat anna über release geschrieben")
+        self.assertEqual(parsed.user, "anna")
+        self.assertEqual(parsed.terms, ["release"])
+
+    def test_relative_days(self):
+        parsed = self.parse("suche nach deploy seit 3 tagen")
+        self.assertEqual(parsed.terms, ["deploy"])
+        self.assertEqual(parsed.since, NOW - timedelta(days=3))
+
+    def test_yesterday(self):
+        parsed = self.parse("nachrichten von max gestern")
+        self.assertEqual(parsed.user, "max")
+        self.assertEqual(parsed.since, MIDNIGHT - timedelta(days=1))
+        self.assertEqual(parsed.until, MIDNIGHT)
+
+    def test_quoted_term(self):
+        parsed = self.parse("nachrichten mit 'release notes' seit gestern")
+        self.assertEqual(parsed.terms, ["release notes"])
+        self.assertEqual(parsed.since, MIDNIGHT - timedelta(days=1))
+        self.assertIsNone(parsed.until)
+
+class SearchIndexTest(unittest.TestCase):
+    def test_search_command_finds_message(self):
+        index = SearchIndex()
+        index.add(SimpleNamespace(seq=1, created_at=NOW, content="Sag hallo", author="max", channel_id=1))
+        parsed = parse_search_query("suche nach nachrichten über hallo", now=NOW)
+        found = index.search(parsed.terms)
+        self.assertEqual([record.seq for record in found], [1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,48 +1,107 @@
 import discord
+import sys
+import time
+from collections import deque
 from datetime import datetime
+from itertools import islice
 from typing import Dict, List, Optional
+from memory_budget import MemoryBudget
+
+# Rough size of a tracked entry without its strings, in bytes
+_USER_OVERHEAD = 250
+_MESSAGE_OVERHEAD = 150
+
+MAX_MESSAGES_PER_USER = 100
+
+class MemberRecord:
+    """Compact member data; timestamps and role names are only formatted on read"""
+    __slots__ = ('username', 'display_name', 'created_at', 'joined_at', 'role_ids', 'last_online', 'is_bot')
+
+    def __init__(self, member: discord.Member):
+        self.username = sys.intern(member.name)
+        self.display_name = member.display_name
+        self.created_at = member.created_at
+        self.joined_at = member.joined_at
+        self.role_ids = tuple(role.id for role in member.roles)
+        self.last_online = time.time()
+        self.is_bot = member.bot
+
+    def size(self) -> int:
+        return _USER_OVERHEAD + len(self.username) + len(self.display_name) + 8 * len(self.role_ids)
 
 class UserTracker:
-    def __init__(self):
-        self.users: Dict = {}
-        self.message_history: Dict = {}
+    def __init__(self, budget: Optional[MemoryBudget] = None):
+        self.users: Dict[int, MemberRecord] = {}
+        self.message_history: Dict[int, deque] = {}  # User ID -> (content, created_at, channel name)
+        self.role_names: Dict[int, str] = {}  # Shared by all members instead of one list per member
+        self._ids_by_name: Dict[str, int] = {}  # Lowercase username -> user ID
+        self.budget = budget
+        if budget is not None:
+            budget.register("user", self._forget_user)
+            budget.register("user_messages", lambda user_id: self.message_history.pop(user_id, None))
 
     def update_user(self, member: discord.Member):
         """Update or add user information"""
-        self.users[str(member.id)] = {
-            'username': member.name,
-            'display_name': member.display_name,
-            'discord_joined': member.created_at.isoformat(),
-            'server_joined': member.joined_at.isoformat() if member.joined_at else None,
-            'roles': [role.name for role in member.roles],
-            'last_online': datetime.now().isoformat(),
-            'is_bot': member.bot
-        }
+        previous = self.users.get(member.id)
+        record = MemberRecord(member)
+        self.users[member.id] = record
+        for role in member.roles:
+            if self.role_names.get(role.id) != role.name:
+                self.role_names[role.id] = role.name
+
+        if previous is not None and previous.username != record.username:
+            self._ids_by_name.pop(previous.username.lower(), None)
+        self._ids_by_name[record.username.lower()] = member.id
+
+        if self.budget is not None:
+            delta = record.size() - (previous.size() if previous else 0)
+            self.budget.charge("user", member.id, member.guild.id, delta)
+
+    def _forget_user(self, user_id: int):
+        record = self.users.pop(user_id, None)
+        if record is not None and self._ids_by_name.get(record.username.lower()) == user_id:
+            del self._ids_by_name[record.username.lower()]
 
     def add_message(self, message: discord.Message):
         """Track a new message from a user"""
-        user_id = str(message.author.id)
-        if user_id not in self.message_history:
-            self.message_history[user_id] = []
-
-        self.message_history[user_id].append({
-            'content': message.content,
-            'timestamp': message.created_at.isoformat(),
-            'channel': message.channel.name
-        })
-
-        # Keep only last 100 messages per user
-        if len(self.message_history[user_id]) > 100:
-            self.message_history[user_id].pop(0)
-
-    def get_user_by_name(self, username: str) -> Optional[Dict]:
-        """Get user data by username"""
-        for user_id, user_data in self.users.items():
-            if user_data['username'].lower() == username.lower():
-                user_data['messages'] = self.message_history.get(user_id, [])
-                return user_data
-        return None
+        history = self.message_history.get(message.author.id)
+        if history is None:
+            history = self.message_history[message.author.id] = deque(maxlen=MAX_MESSAGES_PER_USER)
+
+        entry = (message.content, message.created_at, sys.intern(message.channel.name))
+        delta = _MESSAGE_OVERHEAD + len(message.content)
+        # Keep only last 100 messages per user; the deque drops the oldest itself
+        if len(history) == history.maxlen:
+            delta -= _MESSAGE_OVERHEAD + len(history[0][0])
+        history.append(entry)
+
+        if self.budget is not None:
+            self.budget.charge("user_messages", message.author.id, message.guild.id, delta)
+
+    def _format_user(self, record: MemberRecord) -> Dict:
+        return {
+            'username': record.username,
+            'display_name': record.display_name,
+            'discord_joined': record.created_at.isoformat(),
+            'server_joined': record.joined_at.isoformat() if record.joined_at else None,
+            'roles': [self.role_names.get(role_id, str(role_id)) for role_id in record.role_ids],
+            'last_online': datetime.fromtimestamp(record.last_online).isoformat(),
+            'is_bot': record.is_bot
+        }
+
+    def get_user_by_name(self, username: str, max_messages: int = MAX_MESSAGES_PER_USER) -> Optional[Dict]:
+        """Get user data by username, including the user's most recent messages"""
+        user_id = self._ids_by_name.get(username.lower())
+        if user_id is None:
+            return None
+        user_data = self._format_user(self.users[user_id])
+        recent = list(islice(reversed(self.message_history.get(user_id, ())), max_messages))
+        user_data['messages'] = [
+            {'content': content, 'timestamp': created_at.isoformat(), 'channel': channel}
+            for content, created_at, channel in reversed(recent)
+        ]
+        return user_data
 
     def get_all_users(self) -> List[Dict]:
         """Get list of all tracked users"""
-        return list(self.users.values())
\ No newline at end of file
+        return [self._format_user(record) for record in self.users.values()]